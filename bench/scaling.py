@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+'''
+    scaling.py - Scaling regression check for fr.
+    License: GPLv3+.
+
+    Times fr.linux.get_diskinfo with --all on synthetic trees of increasing
+    size and fails when the time per entry grows with the number of
+    entries, i.e. when the merge of unmounted devices stops being linear.
+
+    usage: scaling.py [-h] [--sizes N,...] [--slack X]
+'''
+import sys
+import tempfile
+from argparse import ArgumentParser
+from os.path import join
+from types import SimpleNamespace
+
+from suite import make_tree, measure, point_at, pform
+
+# defaults
+_sizes      = (1000, 4000, 16000)
+_slack      = 2.0       # allowed growth in time per entry, smallest→largest
+_repeat     = 3
+
+
+def main(opts):
+    settings = SimpleNamespace(debug=False, timeout=None)
+    per_entry = []
+    with tempfile.TemporaryDirectory(prefix='fr-bench-') as tmpdir:
+        for size in opts.sizes:
+            point_at(make_tree(join(tmpdir, str(size)), size))
+            result = measure(
+                lambda: pform.get_diskinfo(settings, show_all=True), _repeat)
+            per_entry.append(result['best'] / size)
+            print(f'{size:>6} entries: {result["best"] * 1000:8.1f} ms, '
+                  f'{per_entry[-1] * 1e6:.2f} µs each')
+
+    growth = per_entry[-1] / per_entry[0]
+    print(f'growth per entry, {opts.sizes[0]}→{opts.sizes[-1]}: '
+          f'{growth:.2f}x, allowed: {opts.slack:.2f}x')
+    if growth > opts.slack:
+        print('FAIL: get_diskinfo --all is not linear.')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    def numbers(text):
+        return tuple(int(num) for num in text.split(','))
+
+    parser = ArgumentParser(usage=__doc__.rstrip())
+    parser.add_argument('--sizes', type=numbers, default=_sizes,
+                        metavar='N,...', help='Entries in each synthetic '
+                        'tree, default: %s.' % ','.join(map(str, _sizes)))
+    parser.add_argument('--slack', type=float, default=_slack, metavar='X',
+                        help='Allowed growth in time per entry.')
+    sys.exit(main(parser.parse_args()))
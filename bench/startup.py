@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+'''
+    startup.py - Startup time regression check for fr.
+    License: GPLv3+.
+
+    Runs the fr script under "python -X importtime" and fails when the
+    imports it adds to a bare interpreter go over budget, or when a module
+    the no-argument fast path is meant to avoid creeps back in.
+
+    usage: startup.py [-h] [--budget MS] [--runs N]
+'''
+import os
+import sys
+import subprocess
+from argparse import ArgumentParser
+from os.path import abspath, dirname, join
+
+root = dirname(dirname(abspath(__file__)))
+script = join(root, 'fr', 'fr')
+
+# defaults
+_budget     = 20.0      # ms
+_runs       = 5
+avoided     = ('argparse', 'shutil', 'subprocess', 'fr.darwin', 'fr.windows')
+
+
+def get_imports(*args):
+    ''' Run python -X importtime with args, return a dict of top-level
+        module: cumulative microseconds, and a set of all modules imported.
+    '''
+    env = dict(os.environ, PYTHONPATH=root, COLUMNS='120')
+    proc = subprocess.run((sys.executable, '-X', 'importtime') + args,
+                          env=env, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, text=True, check=True)
+    toplevel, modules = {}, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules.add(name.strip())
+        if not name.startswith('  '):   # one space after the bar
+            toplevel[name.strip()] = int(cumulative)
+    return toplevel, modules
+
+
+def main(opts):
+    _, baseline = get_imports('-c', 'pass')
+
+    best, modules = None, set()
+    for _ in range(opts.runs):
+        toplevel, modules = get_imports(script)
+        total = sum(usecs for name, usecs in toplevel.items()
+                    if name not in baseline) / 1000
+        best = total if best is None else min(best, total)
+
+    print(f'fr import time: {best:.1f} ms, budget: {opts.budget:.1f} ms')
+    status = os.EX_OK
+    if best > opts.budget:
+        print('FAIL: over budget.')
+        status = 1
+    creeped = sorted(modules.intersection(avoided))
+    if creeped:
+        print('FAIL: fast path imported:', ', '.join(creeped))
+        status = 1
+    return status
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(usage=__doc__.rstrip())
+    parser.add_argument('--budget', type=float, default=_budget, metavar='MS',
+                        help='Maximum import time in milliseconds.')
+    parser.add_argument('--runs', type=int, default=_runs, metavar='N',
+                        help='Best of N runs.')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+'''
+    suite.py - Benchmark suite for fr.
+    License: GPLv3+.
+
+    Generates synthetic /proc/mounts, mountinfo, /proc/meminfo and
+    /dev/disk/by-label trees of a given number of entries, then times
+    collection, rendering and whole-process startup against them.  Results
+    are printed as JSON, so runs can be saved and compared across versions:
+
+        bench/suite.py -o before.json
+        ...
+        bench/suite.py --compare before.json
+
+    usage: suite.py [-h] [--sizes N,...] [--widths N,...] [--repeat N]
+                    [-o FILE] [--compare FILE]
+'''
+import os
+import sys
+import json
+import platform
+import runpy
+import subprocess
+import tempfile
+from argparse import ArgumentParser
+from os.path import abspath, dirname, join
+from statistics import median
+from time import perf_counter, time
+from types import SimpleNamespace
+
+root = dirname(dirname(abspath(__file__)))
+script = join(root, 'fr', 'fr')
+sys.path.insert(0, root)
+
+import fr
+import fr.linux as pform
+from fr import ansi
+from fr.meta import version
+
+# defaults
+_sizes      = (10, 1000, 10000, 50000)
+_widths     = (80, 120, 200)
+_repeat     = 5
+_min_time   = 0.2       # secs per measurement, loops added until reached
+_threshold  = 1.25      # ratio reported as a change by --compare
+namespace   = None      # of the script, loaded when needed
+
+meminfo_tmpl = '''\
+MemTotal:        8052116 kB
+MemFree:         1251200 kB
+MemAvailable:    4623480 kB
+Buffers:          212344 kB
+Cached:          3012344 kB
+SwapCached:        12344 kB
+Active:          3790232 kB
+Inactive:        2223632 kB
+SwapTotal:       2097148 kB
+SwapFree:        1597148 kB
+Dirty:               388 kB
+Shmem:            219880 kB
+Slab:             331064 kB
+HugePages_Total:       0
+'''
+# run the script with paths pointed at a synthetic tree
+runner = '''\
+import runpy, sys
+import fr.linux as pform
+(pform.mntfname, pform.mntinfofname, pform.memfname,
+ pform.diskdir) = sys.argv[1:5]
+sys.argv = [%r] + sys.argv[5:]
+runpy.run_path(%r, run_name='__main__')
+''' % (script, script)
+
+
+def make_tree(path, size):
+    ''' Create a synthetic tree with size mounts, half of them labelled, and
+        as many labelled devices that are not mounted.  Mount points are real
+        directories, so statvfs is a real syscall.
+        Returns mounts, mountinfo, meminfo, and label dir paths.
+    '''
+    mntfname = join(path, 'proc', 'mounts')
+    mntinfofname = join(path, 'proc', 'self', 'mountinfo')
+    memfname = join(path, 'proc', 'meminfo')
+    diskdir = join(path, 'dev', 'disk', 'by-label')
+    os.makedirs(dirname(mntinfofname))
+    os.makedirs(diskdir)
+
+    with open(mntfname, 'w') as outfile, open(mntinfofname, 'w') as infofile:
+        for i in range(size):
+            mntp = join(path, 'mnt', str(i))
+            os.makedirs(mntp)
+            outfile.write(f'/dev/sdb{i} {mntp} ext4 rw,relatime 0 0\n')
+            infofile.write(f'{i + 30} 1 8:{i} / {mntp} rw,relatime '
+                           f'shared:{i} - ext4 /dev/sdb{i} rw\n')
+
+    for i in range(size):
+        target = f'/dev/sdb{i}' if i % 2 else f'/dev/sdc{i}'  # unmounted
+        os.symlink(target, join(diskdir, f'volume{i}'))
+
+    with open(memfname, 'w') as outfile:  # unknown lines scale the parse
+        outfile.write(meminfo_tmpl)
+        for i in range(size):
+            outfile.write(f'Extra{i}:        0 kB\n')
+
+    return mntfname, mntinfofname, memfname, diskdir
+
+
+def point_at(paths):
+    ''' Point the collection module at a synthetic tree. '''
+    pform.mntfname, pform.mntinfofname, pform.memfname, pform.diskdir = paths
+    pform._topology = None  # labels differ per tree
+
+
+def get_opts(width, incolor):
+    ''' Options as the script would set them up for a terminal width,
+        returns them with the script's layout function.
+    '''
+    global namespace
+    if not namespace:
+        namespace = runpy.run_path(script, run_name='fr_script')
+    opts = SimpleNamespace(**namespace['_defaults'])
+    opts.termcols, opts.termrows = width, 50
+    opts.setwidth = opts.width
+    opts.pform = pform
+    opts.incolor = incolor
+    opts.hicolor = pform.hicolor if incolor else None
+    fr.load_config(opts)
+    opts.outunit, opts.unitstr = fr.get_units(opts.unit, binary=opts.binary)
+    return opts, namespace['layout']
+
+
+def measure(func, repeat):
+    ''' Time func, returns a dict of best and median secs per call. '''
+    loops, elapsed = 1, 0
+    while True:  # calibrate
+        start = perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = perf_counter() - start
+        if elapsed >= _min_time:
+            break
+        loops *= 10 if elapsed < _min_time / 10 else 2
+
+    times = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = perf_counter()
+        for _ in range(loops):
+            func()
+        times.append((perf_counter() - start) / loops)
+    return dict(best=min(times), median=median(times), loops=loops)
+
+
+def measure_process(args, env, repeat):
+    ''' Time a child process from start to exit. '''
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        subprocess.run(args, env=env, stdout=subprocess.DEVNULL, check=True)
+        times.append(perf_counter() - start)
+    return dict(best=min(times), median=median(times), loops=1)
+
+
+def run_size(paths, size, widths, repeat):
+    ''' Run the in-process benchmarks on one tree. '''
+    results = []
+
+    def add(name, func, **params):
+        result = dict(name=name, entries=size, **params)
+        result.update(measure(func, repeat))
+        results.append(result)
+        print(f'  {name:14} {size:>6} {params}: '
+              f'{result["best"] * 1000:.3f} ms', file=sys.stderr)
+
+    point_at(paths)
+    settings = SimpleNamespace(debug=False, timeout=None)
+    add('get_meminfo', lambda: pform.get_meminfo(settings))
+    add('get_diskinfo', lambda: pform.get_diskinfo(settings))
+    add('get_diskinfo', lambda: pform.get_diskinfo(settings, show_all=True),
+        show_all=True)
+
+    diskinfo = pform.get_diskinfo(settings)
+    for incolor in (False, True):
+        for width in widths:
+            opts, layout = get_opts(width, incolor)
+            widelayout = layout(opts, diskinfo)
+            add('print_diskinfo',
+                lambda: fr.print_diskinfo(diskinfo, widelayout, incolor,
+                                          buf=[]),
+                width=width, color=incolor)
+    return results
+
+
+def run_rainbar(widths, repeat):
+    ''' Time a bar graph per terminal width, as a disk row would draw it. '''
+    results = []
+    data = (
+        ('▉', 61.5, None, None, None),
+        ('░', 38.5, None, None, False),
+    )
+    for incolor in (False, True):
+        hicolor = pform.hicolor if incolor else None
+        for width in widths:
+            opts, layout = get_opts(width, incolor)
+            layout(opts, ())
+            gwidth = opts.width
+            result = dict(name='rainbar', width=width, color=incolor)
+            result.update(measure(
+                lambda: ansi.rainbar(data, gwidth, incolor, hicolor=hicolor,
+                                     cbrackets=('▕', '▏')), repeat))
+            results.append(result)
+    return results
+
+
+def run_startup(paths, size, widths, repeat, colors=(False, True)):
+    ''' Time the whole script, from process start to exit. '''
+    results = []
+    for incolor in colors:
+        for width in widths:
+            env = dict(os.environ, PYTHONPATH=root, COLUMNS=str(width),
+                       LINES='50', TERM='xterm-256color')
+            env.pop('NO_COLOR', None)
+            args = [sys.executable, '-c', runner] + list(paths)
+            if incolor:
+                args.append('--color=on')   # not a tty, auto is off
+            result = dict(name='startup', entries=size, width=width,
+                          color=incolor)
+            result.update(measure_process(args, env, repeat))
+            results.append(result)
+            print(f'  startup        {size:>6} width={width} '
+                  f'color={incolor}: {result["best"] * 1000:.1f} ms',
+                  file=sys.stderr)
+    return results
+
+
+def get_key(result):
+    ''' Identify a result across runs. '''
+    return tuple(sorted((k, v) for k, v in result.items()
+                        if k not in ('best', 'median', 'loops')))
+
+
+def compare(old, new):
+    ''' Print the change in best time for each result found in both runs,
+        returns the number of regressions.
+    '''
+    previous = {get_key(result): result for result in old['results']}
+    regressions = 0
+    print(f'{old["version"]} → {new["version"]}')
+    for result in new['results']:
+        before = previous.get(get_key(result))
+        if not before:
+            continue
+        ratio = result['best'] / before['best']
+        params = ' '.join(f'{k}={v}' for k, v in get_key(result)
+                          if k != 'name')
+        flag = ''
+        if ratio > _threshold:
+            flag = '  slower'
+            regressions += 1
+        elif ratio < 1 / _threshold:
+            flag = '  faster'
+        print(f'{result["name"]:14} {params:40} {ratio:6.2f}x{flag}')
+    return regressions
+
+
+def main(opts):
+    results = run_rainbar(opts.widths, opts.repeat)
+    with tempfile.TemporaryDirectory(prefix='fr-bench-') as tmpdir:
+        for size in opts.sizes:
+            print(f'generating {size} entries…', file=sys.stderr)
+            paths = make_tree(join(tmpdir, str(size)), size)
+            results.extend(run_size(paths, size, opts.widths, opts.repeat))
+            if size == opts.sizes[0]:   # startup, at each width and color
+                results.extend(run_startup(paths, size, opts.widths,
+                                           opts.repeat))
+            else:                       # end to end at scale
+                results.extend(run_startup(paths, size, opts.widths[:1],
+                                           opts.repeat, colors=(False,)))
+
+    report = dict(
+        version=version,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        time=time(),
+        results=results,
+    )
+    text = json.dumps(report, indent=2)
+    if opts.output:
+        with open(opts.output, 'w') as outfile:
+            outfile.write(text + '\n')
+    elif not opts.compare:
+        print(text)
+
+    if opts.compare:
+        with open(opts.compare) as infile:
+            return 1 if compare(json.load(infile), report) else os.EX_OK
+    return os.EX_OK
+
+
+if __name__ == '__main__':
+    def numbers(text):
+        return tuple(int(num) for num in text.split(','))
+
+    parser = ArgumentParser(usage=__doc__.rstrip())
+    parser.add_argument('--sizes', type=numbers, default=_sizes,
+                        metavar='N,...', help='Entries in each synthetic '
+                        'tree, default: %s.' % ','.join(map(str, _sizes)))
+    parser.add_argument('--widths', type=numbers, default=_widths,
+                        metavar='N,...', help='Terminal widths, default: '
+                        '%s.' % ','.join(map(str, _widths)))
+    parser.add_argument('--repeat', type=int, default=_repeat, metavar='N',
+                        help='Measurements per benchmark, best is kept.')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='Write results to FILE instead of stdout.')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='Compare with earlier results, fail if slower.')
+    sys.exit(main(parser.parse_args()))
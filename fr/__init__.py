@@ -5,15 +5,18 @@
     Output routines located here.
 '''
 import sys
-import locale
-
-from . import ansi
+from functools import wraps
 
 
 # defaults
 _outunit = 1000000, 'Megabyte'  # 1 Megabyte default
 opts, pform = None, None
+locale = None           # imported when needed, as is .ansi
+numconv = None          # decimal point, thousands separator, grouping
+_strfmts, _valfmts, _numfmts = {}, {}, {}  # compiled formatters
 dim_templ, swap_clr_templ = None, None
+io_cols = ('READ/s', 'WRITE/s', 'IOPS', 'LAT ms', 'QUEUE')
+io_width = 7            # of each io column
 out = sys.stdout.write
 
 if sys.platform[:3] == 'win':  # :-(
@@ -38,13 +41,81 @@ _warnico = '⚠'
 _brckico = ('▕', '▏')    # start, end "brackets"
 
 
+def get_pform():
+    ''' Import and return the collection module for this platform. '''
+    plat = sys.platform[:3]
+    if plat == 'lin':
+        from . import linux as pform
+    elif plat == 'win':
+        from . import windows as pform
+    elif plat == 'dar':
+        from . import darwin as pform
+    else:
+        raise NotImplementedError(f'platform {sys.platform!r} not supported')
+    return pform
+
+
+def collect(local_only=False, show_all=False, show_binds=False, timeout=None,
+            debug=False, mount_filter=None, container=None):
+    ''' Returns a Snapshot of the current memory and disk info, counted in
+        exact bytes, its records frozen.  Raises OSError if either could
+        not be read.
+
+        local_only  - skip network filesystems
+        show_all    - include unmounted devices and tmpfs mounts
+        show_binds  - list each mount of a shared filesystem, e.g. bind
+                      mounts, rather than one
+        timeout     - secs. before a mount is marked unresponsive
+        mount_filter - a filters.MountFilter, to skip mounts early
+        container   - count memory against the limits of the enclosing
+                      cgroup, or None to do so only when inside a cgroup
+                      namespace, as in most containers
+    '''
+    from time import time
+    from types import SimpleNamespace
+    from .utils import Snapshot
+
+    pform = get_pform()
+    settings = SimpleNamespace(container=container, debug=debug,
+                               mount_filter=mount_filter, timeout=timeout)
+    timestamp = time()
+
+    meminfo = pform.get_meminfo(settings)
+    if not meminfo:
+        raise OSError(f'Could not read memory info @ {pform.memfname}')
+
+    diskinfo = pform.get_diskinfo(settings, local_only=local_only,
+                                  show_all=show_all, show_binds=show_binds)
+    if diskinfo is None:    # empty is fine, e.g. all filtered out
+        raise OSError('Could not read disk information')
+
+    return Snapshot(timestamp, meminfo.freeze(),
+                    tuple(disk.freeze() for disk in diskinfo))
+
+
 def load_config(options):
-    ''' Load options, platform, colors, and icons. '''
+    ''' Load options, platform, colors, and icons.  Once loaded, only the
+        options are swapped, keeping compiled formatters for reuse.
+    '''
     global opts, pform
     opts = options
+    if pform is options.pform and numconv:
+        return
     pform = options.pform
     global_ns = globals()
 
+    # escapes, and numbers formatted per locale, set up only when needed
+    global ansi, locale
+    import locale
+    from . import ansi
+    locale.setlocale(getattr(locale, pform.locale_cat), '')
+    conv = locale.localeconv()
+    global_ns['numconv'] = (conv['decimal_point'], conv['thousands_sep'],
+                            conv['grouping'])
+    _strfmts.clear()
+    _valfmts.clear()
+    _numfmts.clear()
+
     # get colors
     if pform.hicolor:
         global_ns['dim_templ'] = ansi.dim8t
@@ -59,51 +130,117 @@ def load_config(options):
             global_ns[varname] = getattr(pform, varname)
 
 
+def buffered(func):
+    ''' Decorates output functions to render into buf, a list of strings.
+        When no buf is passed, a new one is joined and written in one call.
+    '''
+    @wraps(func)
+    def wrapper(*args, buf=None, **kwargs):
+        if buf is None:
+            frame = []
+            func(*args, buf=frame, **kwargs)
+            out(''.join(frame))
+        else:
+            func(*args, buf=buf, **kwargs)
+    return wrapper
 
-def fmtstr(text='', colorstr=None, align='>', trunc=True, width=0, end=' '):
-    ''' Formats, justifies, and returns a given string according to
-        specifications.
+
+def get_numfmt(precision):
+    ''' Returns a function that formats a number with the locale's decimal
+        mark and digit grouping, compiled once per precision.
     '''
-    colwidth = width or opts.colwidth
+    func = _numfmts.get(precision)
+    if func is None:
+        func = _numfmts[precision] = compile_numfmt(precision)
+    return func
 
-    if trunc:
-        if len(text) > colwidth:
-            text = truncstr(text, colwidth, align=trunc)  # truncate w/ellipsis
 
-    value = f'{text:{align}{colwidth}}'
-    if opts.incolor and colorstr:
-        return colorstr % value + end
-    else:
-        return value + end
+def compile_numfmt(precision):
+    ''' Compiles a function that formats a number with the locale's decimal
+        mark and digit grouping, same as locale.format_string(fmt, value,
+        True), from the conventions read once in load_config.
+    '''
+    decimal_point, thousands_sep, grouping = numconv
+    pyfmt = '%%.%sf' % precision
 
+    if not (grouping and thousands_sep):    # e.g. C locale
+        if decimal_point == '.':
+            return pyfmt.__mod__
+        return lambda value: (pyfmt % value).replace('.', decimal_point)
 
-def fmtval(value, colorstr=None, precision=None, spacing=True, trunc=True,
-           end=' '):
-    ''' Formats and returns a given number according to specifications. '''
-    colwidth = opts.colwidth
-    # get precision
+    elif grouping[-1] == 0 and set(grouping[:-1]) == {3}:  # thousands
+        spec = ',.%sf' % precision
+        if (decimal_point, thousands_sep) == ('.', ','):
+            return lambda value: format(value, spec)
+        table = str.maketrans({'.': decimal_point, ',': thousands_sep})
+        return lambda value: format(value, spec).translate(table)
+
+    else:                                   # rare, let locale handle it
+        return lambda value: locale.format_string(pyfmt, value, True)
+
+
+def get_fmtstr(colorstr=None, align='>', trunc=True, width=0, end=' '):
+    ''' Returns a function that formats, justifies, and returns a given
+        string according to specifications.  See fmtstr.
+    '''
+    colwidth = width or opts.colwidth
+    colorstr = colorstr if opts.incolor else None
+    key = (colorstr, align, trunc, colwidth, end)
+    func = _strfmts.get(key)
+    if func is None:
+        spec = f'{align}{colwidth}'
+
+        def func(text=''):
+            if trunc and len(text) > colwidth:  # truncate w/ellipsis
+                text = truncstr(text, colwidth, align=trunc)
+            value = format(text, spec)
+            if colorstr:
+                return colorstr % value + end
+            return value + end
+
+        _strfmts[key] = func
+    return func
+
+
+def get_fmtval(colorstr=None, precision=None, spacing=True, trunc=True,
+               end=' '):
+    ''' Returns a function that formats a given number according to
+        specifications.  See fmtval.
+    '''
     if precision is None:
         precision = opts.precision
-    fmt = '%%.%sf' % precision
+    colwidth = opts.colwidth
+    colorstr = colorstr if opts.incolor else None
+    key = (colorstr, precision, spacing, trunc, colwidth, end)
+    func = _valfmts.get(key)
+    if func is None:
+        numfmt = get_numfmt(precision)
+
+        def func(value):
+            result = numfmt(value)
+            if spacing:
+                result = result.rjust(colwidth)
+            if trunc and len(result) > colwidth:   # truncate w/ellipsis
+                result = truncstr(result, colwidth)
+            if colorstr:
+                return colorstr % result + end
+            return result + end
+
+        _valfmts[key] = func
+    return func
 
-    # format with decimal mark, separators
-    try:
-        result = locale.format_string(fmt, value, True)  #  >= Py 3.7
-    except AttributeError:  # olden tymes
-        result = locale.format(fmt, value, True)
 
-    if spacing:
-        result = '%%%ss' % colwidth % result
+def fmtstr(text='', colorstr=None, align='>', trunc=True, width=0, end=' '):
+    ''' Formats, justifies, and returns a given string according to
+        specifications.
+    '''
+    return get_fmtstr(colorstr, align, trunc, width, end)(text)
 
-    if trunc:
-        if len(result) > colwidth:   # truncate w/ellipsis
-            result = truncstr(result, colwidth)
 
-    # Add color if needed
-    if opts.incolor and colorstr:
-        return colorstr % result + end
-    else:
-        return result + end
+def fmtval(value, colorstr=None, precision=None, spacing=True, trunc=True,
+           end=' '):
+    ''' Formats and returns a given number according to specifications. '''
+    return get_fmtval(colorstr, precision, spacing, trunc, end)(value)
 
 
 def get_units(unit, binary=False):
@@ -152,12 +289,67 @@ def get_units(unit, binary=False):
     return result
 
 
-def print_diskinfo(diskinfo, widelayout, incolor):
-    ''' Disk information output function. '''
+@buffered
+def print_header(unitstr, widelayout, buf=None):
+    ''' Title and column headers output function. '''
+    put = buf.append
+    out_fmt = fmtval(opts.outunit, precision=0, spacing=False, trunc=False,
+                     end='')
+    put(f'\nFree Resources in Blocks of 1 {unitstr} ({out_fmt} bytes)\n')
+
+    put('\n' +
+        fmtstr('DEVICE', align='<') +
+        fmtstr('VOLUME', align='<')
+    )
+    for header in ['CAPACITY', 'USED', 'FREE']:
+        put(fmtstr(header))
+
+    if widelayout:
+        if ' ' in pform.col_lblw:   # figure expanding label (on posix)
+            lbl = list(pform.col_lblw)
+            while len(lbl) < opts.colwidth:
+                lbl.insert(5, ' ')
+            lbl = ''.join(lbl)
+        else:
+            lbl = pform.col_lblw    # windows
+        put(' ' * (opts.width + 1))
+        if opts.history:
+            put(fmtstr('TREND', align='<', width=opts.history.width))
+        if opts.eta:
+            put(fmtstr('ETA'))
+        if opts.io:
+            put(''.join(fmtstr(col, width=io_width) for col in io_cols))
+        put(fmtstr(lbl))
+    else:
+        put(' ' + fmtstr(pform.col_lbls))
+    put('\n')
+
+
+@buffered
+def print_diskinfo(diskinfo, widelayout, incolor, buf=None):
+    ''' Disk information output function, converts to opts.outunit. '''
+    put = buf.append
     sep = ' '
+    outunit = opts.outunit
+    # compile column formatters, cells that don't change
+    fmt_left = get_fmtstr(align='<')
+    fmt_mntp = get_fmtstr(align='<', trunc='left',
+                          width=(opts.colwidth * 2) + 2)
+    fmt_num = get_fmtval()
+    blank = fmtstr()
+    empty = fmtstr(_emptico, dim_templ)
+    nolabel = fmtstr(_emptico, dim_templ, align='<')
+    history, forecast = opts.history, opts.eta
+    noextra = ''    # blank trend and eta columns
+    if history:
+        noextra += sep * (history.width + 1)
+    if forecast:
+        noextra += sep * (opts.colwidth + 1)
+    if opts.io:
+        noextra += fmtiostat(None)
     if opts.relative:
         import math
-        base = max([ disk.ocap for disk in diskinfo ])
+        base = max([ disk.cap or 0 for disk in diskinfo ], default=0)
 
     for disk in diskinfo:
         if disk.ismntd:     ico = _diskico
@@ -169,10 +361,31 @@ def print_diskinfo(diskinfo, widelayout, incolor):
         if disk.isimg:      ico = _imgico
         if disk.mntp == '/boot/efi':
                             ico = _gearico
+        if disk.ishung:     ico = _warnico
+
+        mntp = fmt_mntp(disk.mntp).rstrip()  # prevent wrap
+        if disk.label is None:
+            label = nolabel
+        else:
+            label = fmt_left(disk.label)
+
+        if disk.ishung:     # nothing to show but where
+            put(
+                fmt_left(ico + sep + disk.dev) + label +
+                fmtstr('unresponsive', dim_templ, align='<',
+                       width=(opts.colwidth * 3) + 2)
+            )
+            if widelayout:
+                put(sep * opts.width + noextra + sep + mntp + '\n')
+            else:
+                put(sep + sep + mntp + '\n')
+                put('\n')
+                put('\n')
+            continue
 
-        if opts.relative and disk.ocap and disk.ocap != base:
+        if opts.relative and disk.cap and disk.cap != base:
             # increase log size reduction by raising to 4th power:
-            gwidth = int((math.log(disk.ocap, base)**4) * opts.width)
+            gwidth = int((math.log(disk.cap, base)**4) * opts.width)
         else:
             gwidth = opts.width
 
@@ -183,90 +396,96 @@ def print_diskinfo(diskinfo, widelayout, incolor):
             # dim or dark grey
             ffg = ufg = (ansi.dim8 if opts.hicolor else ansi.dim4)
 
-        cap = disk.cap
+        cap = disk.cap / outunit
+        used = disk.used / outunit
+        free = disk.free / outunit
         if cap and disk.rw:
             lblcolor = ansi.get_label_tmpl(disk.pcnt, opts.width, opts.hicolor)
         else:
             lblcolor = None
+        fmt_lbl = get_fmtval(lblcolor)
 
         # print stats
         data = (
             (_usedico, disk.pcnt,     ufg,  None,  pform.boldbar),  # Used
             (_freeico, 100-disk.pcnt, ffg,  None,  False),          # free
         )
-        mntp = fmtstr(disk.mntp, align='<', trunc='left',
-                      width=(opts.colwidth * 2) + 2)
-        mntp = mntp.rstrip()  # prevent wrap
-        if disk.label is None:
-            label = fmtstr(_emptico, dim_templ, align='<')
-        else:
-            label = fmtstr(disk.label, align='<')
 
         if widelayout:
-            out(
-                fmtstr(ico + sep + disk.dev, align='<') + label
-            )
+            put(fmt_left(ico + sep + disk.dev) + label)
             if cap:
-                out(fmtval(cap))
+                put(fmt_num(cap))
                 if disk.rw:
-                    out(
-                        fmtval(disk.used, lblcolor) +
-                        fmtval(disk.free, lblcolor)
-                    )
+                    put(fmt_lbl(used) + fmt_lbl(free))
                 else:
-                    out(
-                        fmtstr() +
-                        fmtstr(_emptico, dim_templ)
-                    )
+                    put(blank + empty)
             else:
-                out(fmtstr(_emptico, dim_templ))
+                put(empty)
 
             if cap:
                 if disk.rw:  # factoring this caused colored brackets
-                    ansi.rainbar(data, gwidth, incolor,
-                                 hicolor=opts.hicolor,
-                                 cbrackets=_brckico)
+                    put(ansi.rainbar(data, gwidth, incolor,
+                                     hicolor=opts.hicolor,
+                                     cbrackets=_brckico))
                 else:
-                    ansi.bargraph(data, gwidth, incolor, cbrackets=_brckico)
+                    put(ansi.bargraph(data, gwidth, incolor,
+                                      cbrackets=_brckico))
 
                 if opts.relative and opts.width != gwidth:
-                    out(sep * (opts.width - gwidth))
-                out(sep + mntp)
-            print()
+                    put(sep * (opts.width - gwidth))
+                if history:
+                    put(sep + history.get_sparkline('disk:' + disk.mntp))
+                if forecast:    # read-only won't fill
+                    put(sep + (fmteta('disk:' + disk.mntp, disk.free)
+                               if disk.rw else fmtstr(end='')))
+                if opts.io:
+                    put(fmtiostat(opts.io.get(disk.dev)))
+                put(sep + mntp)
+            put('\n')
         else:
-            out(
-                fmtstr(ico + sep + disk.dev, align="<") + label
-            )
+            put(fmt_left(ico + sep + disk.dev) + label)
             if cap:
-                out(
-                    fmtval(cap) +
-                    fmtval(disk.used, lblcolor) +
-                    fmtval(disk.free, lblcolor)
+                put(
+                    fmt_num(cap) +
+                    fmt_lbl(used) +
+                    fmt_lbl(free)
                 )
             else:
-                out(fmtstr(_emptico, dim_templ) + fmtstr() + fmtstr())
-            print(sep, mntp)
+                put(empty + blank + blank)
+            put(sep + sep + mntp + '\n')
 
             if cap:
-                out(fmtstr())
+                put(blank)
                 if disk.rw:
-                    ansi.rainbar(data, gwidth, incolor, hicolor=opts.hicolor,
-                                 cbrackets=_brckico)
+                    put(ansi.rainbar(data, gwidth, incolor,
+                                     hicolor=opts.hicolor,
+                                     cbrackets=_brckico))
                 else:
-                    ansi.bargraph(data, gwidth, incolor, cbrackets=_brckico)
-            print()
-            print()
-    print()
-
-
-def print_meminfo(meminfo, widelayout, incolor):
-    ''' Memory information output function. '''
+                    put(ansi.bargraph(data, gwidth, incolor,
+                                      cbrackets=_brckico))
+                if history:
+                    put(sep + history.get_sparkline('disk:' + disk.mntp))
+                if forecast:    # read-only won't fill
+                    put(sep + (fmteta('disk:' + disk.mntp, disk.free)
+                               if disk.rw else fmtstr(end='')))
+                if opts.io:
+                    put(fmtiostat(opts.io.get(disk.dev)))
+            put('\n')
+            put('\n')
+    put('\n')
+
+
+@buffered
+def print_meminfo(meminfo, widelayout, incolor, buf=None):
+    ''' Memory information output function, converts to opts.outunit. '''
+    put = buf.append
     sep = ' '
+    outunit = opts.outunit
     # prep Mem numbers
-    totl = meminfo.memtotal
-    cach = meminfo.cached + meminfo.buffers
-    free = meminfo.memfree
-    used = meminfo.used
+    totl = meminfo.memtotal / outunit
+    cach = (meminfo.cached + meminfo.buffers) / outunit
+    free = meminfo.memfree / outunit
+    used = meminfo.used / outunit
 
     usep = float(used) / totl * 100           # % used of total ram
     cacp = float(cach) / totl * 100           # % cache
@@ -274,11 +493,11 @@ def print_meminfo(meminfo, widelayout, incolor):
     rlblcolor = ansi.get_label_tmpl(usep, opts.width, opts.hicolor)
 
     # Prepare Swap numbers
-    swpt = meminfo.swaptotal
+    swpt = meminfo.swaptotal / outunit
     if swpt:
-        swpf = meminfo.swapfree
-        swpc = meminfo.swapcached
-        swpu = meminfo.swapused
+        swpf = meminfo.swapfree / outunit
+        swpc = meminfo.swapcached / outunit
+        swpu = meminfo.swapused / outunit
         swfp = float(swpf) / swpt * 100       # % free of total sw
         swcp = float(swpc) / swpt * 100       # % cache
         swup = float(swpu) / swpt * 100       # % used
@@ -287,6 +506,7 @@ def print_meminfo(meminfo, widelayout, incolor):
         swpf = swpc = swpu = swfp = swcp = swup = 0         # avoid /0 error
         slblcolor = None
     cacheico = _usedico if incolor else _cmonico
+    history = opts.history
 
     # print RAM info
     data = (
@@ -295,7 +515,7 @@ def print_meminfo(meminfo, widelayout, incolor):
         (_freeico, frep, None,  None, False),               # free
     )
     if widelayout:
-        out(
+        put(
             fmtstr(_ramico + ' RAM', align='<') +
             fmtstr() +                                      # volume col
             fmtval(totl) +
@@ -303,11 +523,17 @@ def print_meminfo(meminfo, widelayout, incolor):
             fmtval(free, rlblcolor)
         )
         # print graph
-        ansi.rainbar(data, opts.width, incolor, hicolor=opts.hicolor,
-                     cbrackets=_brckico)
-        print('', fmtval(cach, swap_clr_templ))
+        put(ansi.rainbar(data, opts.width, incolor, hicolor=opts.hicolor,
+                         cbrackets=_brckico))
+        if history:
+            put(sep + history.get_sparkline('ram'))
+        if opts.eta:
+            put(sep + fmtstr(end=''))                       # eta col
+        if opts.io:
+            put(fmtiostat(None))
+        put(sep + fmtval(cach, swap_clr_templ) + '\n')
     else:
-        out(
+        put(
             fmtstr(_ramico + ' RAM', align="<") +
             fmtstr() +                                      # volume col
             fmtval(totl) +
@@ -318,9 +544,11 @@ def print_meminfo(meminfo, widelayout, incolor):
             fmtstr()                                        # blank space
         )
         # print graph
-        ansi.rainbar(data, opts.width, incolor, hicolor=opts.hicolor,
-                     cbrackets=_brckico)
-        print()                             # extra line in narrow layout
+        put(ansi.rainbar(data, opts.width, incolor, hicolor=opts.hicolor,
+                         cbrackets=_brckico))
+        if history:
+            put(sep + history.get_sparkline('ram'))
+        put('\n')                           # extra line in narrow layout
 
     # Swap time:
     data = (
@@ -329,46 +557,176 @@ def print_meminfo(meminfo, widelayout, incolor):
         (_freeico, swfp, None, None, False),                # free
     )
     if widelayout:
-        out(fmtstr(_diskico + ' SWAP', align='<') + fmtstr())   # label
+        put(fmtstr(_diskico + ' SWAP', align='<') + fmtstr())   # label
         if swpt:
-            out(
+            put(
                 fmtval(swpt) +
                 fmtval(swpu, slblcolor) +
                 fmtval(swpf, slblcolor)
             )
         else:
-            print(fmtstr(_emptico, dim_templ))
+            put(fmtstr(_emptico, dim_templ) + '\n')
 
         # print graph
         if swpt:
-            ansi.rainbar(data, opts.width, incolor, hicolor=opts.hicolor,
-                         cbrackets=_brckico)
+            put(ansi.rainbar(data, opts.width, incolor,
+                             hicolor=opts.hicolor, cbrackets=_brckico))
+            if history:
+                put(sep + history.get_sparkline('swap'))
+            if opts.eta:
+                put(sep + fmteta('swap', meminfo.swapfree))
+            if opts.io and swpc:
+                put(fmtiostat(None))
             if swpc:
-                out(' ' + fmtval(swpc, swap_clr_templ))
-            print()
+                put(' ' + fmtval(swpc, swap_clr_templ))
+            put('\n')
     else:
-        out(fmtstr(_diskico + ' SWAP', align='<'))
+        put(fmtstr(_diskico + ' SWAP', align='<'))
         if swpt:
-            out(
+            put(
                 fmtstr() +                                  # volume col
                 fmtval(swpt) +
                 fmtval(swpu, slblcolor) +
                 fmtval(swpf, slblcolor)
             )
             if swpc:
-                out('  ' + fmtval(swpc, swap_clr_templ))
-            print()
-            out(fmtstr())  # blank space
+                put('  ' + fmtval(swpc, swap_clr_templ))
+            put('\n')
+            put(fmtstr())  # blank space
 
             # print graph
-            ansi.rainbar(data, opts.width, incolor, hicolor=opts.hicolor,
-                         cbrackets=_brckico)
-            print()
+            put(ansi.rainbar(data, opts.width, incolor,
+                             hicolor=opts.hicolor, cbrackets=_brckico))
+            if history:
+                put(sep + history.get_sparkline('swap'))
+            if opts.eta:
+                put(sep + fmteta('swap', meminfo.swapfree))
+            put('\n')
         else:
-            print(' ' + fmtstr(_emptico, dim_templ, align='<'))
-        print()
+            put(' ' + fmtstr(_emptico, dim_templ, align='<') + '\n')
+        put('\n')
+
+    put('\n')  # extra newline separates mem and disk sections
+
 
-    print()  # extra newline separates mem and disk sections
+@buffered
+def print_numainfo(nodes, widelayout, incolor, buf=None):
+    ''' NUMA node memory output function, converts to opts.outunit.
+        nodes - a list of (node number, MemInfo)
+    '''
+    put = buf.append
+    sep = ' '
+    outunit = opts.outunit
+    cacheico = _usedico if incolor else _cmonico
+    blank = fmtstr()
+
+    for num, meminfo in nodes:
+        totl = meminfo.memtotal / outunit
+        cach = meminfo.cached / outunit
+        free = meminfo.memfree / outunit
+        used = meminfo.used / outunit
+        usep = meminfo.used / meminfo.memtotal * 100
+        cacp = meminfo.cached / meminfo.memtotal * 100
+        frep = meminfo.memfree / meminfo.memtotal * 100
+        lblcolor = ansi.get_label_tmpl(usep, opts.width, opts.hicolor)
+        data = (
+            (_usedico, usep, None,  None, pform.boldbar),       # used
+            (cacheico, cacp, ansi.blue,  None, pform.boldbar),  # cache
+            (_freeico, frep, None,  None, False),               # free
+        )
+        put(
+            fmtstr(f'{_ramico} node{num}', align='<') +
+            blank +                                         # volume col
+            fmtval(totl) +
+            fmtval(used, lblcolor) +
+            fmtval(free, lblcolor)
+        )
+        if widelayout:
+            put(ansi.rainbar(data, opts.width, incolor, hicolor=opts.hicolor,
+                             cbrackets=_brckico))
+            if opts.history:
+                put(sep * (opts.history.width + 1))         # trend col
+            if opts.eta:
+                put(sep + fmtstr(end=''))                   # eta col
+            if opts.io:
+                put(fmtiostat(None))
+            put(sep + fmtval(cach, swap_clr_templ) + '\n')
+        else:
+            put(sep + sep + fmtval(cach, swap_clr_templ) + '\n' + blank)
+            put(ansi.rainbar(data, opts.width, incolor, hicolor=opts.hicolor,
+                             cbrackets=_brckico) + '\n')
+    put('\n')
+
+
+@buffered
+def print_cgroups(cgroups, total, widelayout, incolor, buf=None):
+    ''' Control group memory output function, converts to opts.outunit.
+        Bars are drawn against the group's limit, or total if it has none.
+    '''
+    put = buf.append
+    sep = ' '
+    outunit = opts.outunit
+    fmt_name = get_fmtstr(align='<', width=(opts.colwidth * 2) + 1)
+    fmt_num = get_fmtval()
+    blank = fmtstr()
+    empty = fmtstr(_emptico, dim_templ)
+    put(fmt_name('CGROUP') + fmtstr('LIMIT') + fmtstr('USED') +
+        fmtstr('FREE') + '\n')
+
+    for group in cgroups:
+        name = '  ' * (group.depth - 1) + group.path.rpartition('/')[2]
+        limit = min(group.limit or total, total)
+        pcnt = min(group.used / limit * 100, 100) if limit else 0
+        fmt_lbl = get_fmtval(ansi.get_label_tmpl(pcnt, opts.width,
+                                                 opts.hicolor))
+        put(fmt_name(name))
+        if group.limit is None:
+            put(empty + fmt_lbl(group.used / outunit) + blank)
+        else:
+            put(fmt_num(group.limit / outunit) +
+                fmt_lbl(group.used / outunit) +
+                fmt_lbl(max(group.limit - group.used, 0) / outunit))
+
+        data = (
+            (_usedico, pcnt,     None, None, pform.boldbar),    # used
+            (_freeico, 100-pcnt, None, None, False),            # free
+        )
+        if not widelayout:
+            put('\n' + blank)
+        put(ansi.rainbar(data, opts.width, incolor, hicolor=opts.hicolor,
+                         cbrackets=_brckico) + '\n')
+    put('\n')
+
+
+def fmtiostat(stat):
+    ''' Formats the io columns of a disk row, blank if stat is None.
+        Throughput is in opts.outunit per sec.
+    '''
+    if stat is None:
+        return ' ' * (len(io_cols) * (io_width + 1))
+    outunit = opts.outunit
+    tenths, whole = get_numfmt(1), get_numfmt(0)
+    cells = (tenths(stat.rbytes / outunit), tenths(stat.wbytes / outunit),
+             whole(stat.iops), tenths(stat.latency), str(stat.inflight))
+    return ''.join(' ' + (truncstr(cell, io_width) if len(cell) > io_width
+                          else cell.rjust(io_width))
+                   for cell in cells)
+
+
+def fmteta(name, free):
+    ''' Formats the time until a series fills its free bytes, colored by
+        urgency.
+    '''
+    from .forecast import format_eta, get_urgency
+    secs = opts.eta.get_eta(name, free)
+    if secs is None:    # not enough samples yet
+        return fmtstr(end='')
+    level = get_urgency(secs)
+    if level is None:
+        color = dim_templ
+    else:
+        color = ansi.get_label_tmpl(level, 100, opts.hicolor)
+    return fmtstr(format_eta(secs), color, end='')
 
 
 def truncstr(text, width, align='right'):
@@ -6,11 +6,7 @@
     dependency containing ansi routines.
 '''
 import sys
-
-out = sys.stdout.write
-if sys.platform[:3] == 'win':  # don't bypass streams :-(
-    def out(*args, end=''):
-        print(*args, end=end)
+from functools import lru_cache
 
 
 if True:  # foldable init
@@ -104,6 +100,19 @@ if True:  # foldable init
     map8 = {blue: blu8, red: red8, green: grn8, dim: dim}
     rst8 = grn8
 
+    # cursor addressing
+    cur_pos     = '\x1b[%s;%sH'     # row, column; 1-based
+    cur_hide    = '\x1b[?25l'
+    cur_show    = '\x1b[?25h'
+    clear_scr   = '\x1b[H\x1b[2J'
+    erase_eol   = '\x1b[K'
+    erase_eos   = '\x1b[J'
+    wrap_off    = '\x1b[?7l'
+    wrap_on     = '\x1b[?7h'
+    reset       = '\x1b[0m'
+    resets      = ('\x1b[0m', '\x1b[00m',     # full
+                   '\x1b[0;', '\x1b[00;')     # partial
+
 
 def colorstart(fgcolor, bgcolor, weight):
     ''' Begin a text style. '''
@@ -112,46 +121,46 @@ def colorstart(fgcolor, bgcolor, weight):
     else:
         weight = norm
     if bgcolor:
-        out('\x1b[%s;%s;%sm' % (weight, fgcolor, bgcolor))
+        return '\x1b[%s;%s;%sm' % (weight, fgcolor, bgcolor)
     else:
-        out('\x1b[%s;%sm' % (weight, fgcolor))
+        return '\x1b[%s;%sm' % (weight, fgcolor)
 
 
 def colorend(cr=False):
     ''' End color styles.  Resets to default terminal colors. '''
     if cr:
-        out('\x1b[0m\n')
+        return '\x1b[0m\n'
     else:
-        out('\x1b[0m')
+        return '\x1b[0m'
 
 
 def cprint(text, fg=grey, bg=blackbg, w=norm, cr=False, encoding='utf8'):
-    ''' Print a string in a specified color style and then return to normal.
+    ''' Return a string in a specified color style and then back to normal.
         def cprint(text, fg=white, bg=blackbg, w=norm, cr=True):
     '''
-    colorstart(fg, bg, w)
-    out(text)
-    colorend(cr)
+    return colorstart(fg, bg, w) + text + colorend(cr)
 
 
 def bargraph(data, maxwidth, incolor=True, cbrackets=('\u2595', '\u258F')):
-    ''' Creates a monochrome or two-color bar graph. '''
+    ''' Creates a monochrome or two-color bar graph, returns a string. '''
     threshold = 100.0 // (maxwidth * 2)  # if smaller than 1/2 of one char wide
     position = 0
     begpcnt = data[0][1] * 100
     endpcnt = data[-1][1] * 100
 
-    if len(data) < 1: return        # Nada to do
+    if len(data) < 1: return ''     # Nada to do
     maxwidth = maxwidth - 2         # because of brackets
     datalen = len(data)
+    result = []
+    put = result.append
 
     # Print left bracket in correct color:
     if cbrackets and incolor:       # and not (begpcnt == 0 and endpcnt == 0):
         if begpcnt < threshold: bkcolor = data[-1][2]  # greenbg
         else:                   bkcolor = data[0][2]   # redbg
-        cprint(cbrackets[0], data[0][2], bkcolor, None, None)
+        put(cprint(cbrackets[0], data[0][2], bkcolor, None, None))
     else:
-        out(cbrackets[0])
+        put(cbrackets[0])
 
     for i, part in enumerate(data):
         # unpack data
@@ -161,27 +170,28 @@ def bargraph(data, maxwidth, incolor=True, cbrackets=('\u2595', '\u258F')):
 
         # and graph
         if incolor and not (fgcolor is None):
-            cprint(char * width, fgcolor, bgcolor, bold, False)
+            put(cprint(char * width, fgcolor, bgcolor, bold, False))
         else:
-            out((char * width))
+            put((char * width))
 
         if i == (datalen - 1):   # correct last one
             if position < maxwidth:
                 if incolor:     # char
-                    cprint(char * (maxwidth-position), fgcolor, bgcolor,
-                           bold, False)
+                    put(cprint(char * (maxwidth-position), fgcolor, bgcolor,
+                               bold, False))
                 else:
-                    out(char * (maxwidth-position))
+                    put(char * (maxwidth-position))
             elif position > maxwidth:
-                out(chr(8) + ' ' + chr(8))  # backspace
+                put(chr(8) + ' ' + chr(8))  # backspace
 
     # Print right bracket in correct color:
     if cbrackets and incolor:
         if endpcnt < threshold: bkcolor = data[0][3]    # redbg
         else:                   bkcolor = data[1][3]    # greenbg
-        cprint(cbrackets[1], data[-1][2], bkcolor, None, None)
+        put(cprint(cbrackets[1], data[-1][2], bkcolor, None, None))
     else:
-        out(cbrackets[1])
+        put(cbrackets[1])
+    return ''.join(result)
 
 
 def get_palette(hicolor):
@@ -192,11 +202,15 @@ def get_palette(hicolor):
 
 
 def get_label_tmpl(value, maxwidth, hicolor):
-    csi, csib, blk, pal, rst, plen = get_palette(hicolor)
-    # not happy with calculating this again...
-    pos = int(maxwidth * (value / 100.0)) - 1
-    colorind = get_color_index(pos, 0, maxwidth, plen)
-    return blk % pal[colorind]
+    ''' Returns the color template for a label, matching the bar color at
+        value percent.
+    '''
+    tmpls = get_label_tmpls(maxwidth, hicolor)
+    pos = int(maxwidth * (value / 100.0))   # table starts at -1, not 0
+    if 0 <= pos < len(tmpls):
+        return tmpls[pos]
+    csi, csib, blk, pal, rst, plen = get_palette(hicolor)  # out of range
+    return blk % pal[get_color_index(pos - 1, 0, maxwidth, plen)]
 
 
 def get_color_index(pos, offset, maxwidth, plen):
@@ -204,67 +218,163 @@ def get_color_index(pos, offset, maxwidth, plen):
     return min(int((pos+offset)/bucket), (plen-1))
 
 
+@lru_cache()
+def get_label_tmpls(maxwidth, hicolor):
+    ''' Label color templates for each bar position, from -1 to maxwidth. '''
+    csi, csib, blk, pal, rst, plen = get_palette(hicolor)
+    return tuple(blk % pal[get_color_index(pos, 0, maxwidth, plen)]
+                 for pos in range(-1, maxwidth + 1))
+
+
+@lru_cache()
+def get_color_runs(maxwidth, plen):
+    ''' Splits a bar of maxwidth into runs of the same palette index.
+        Returns a tuple of (start, end, index) tuples, the last run is
+        open-ended as positions past the end keep the last color.
+    '''
+    if maxwidth < 1:
+        return ((0, sys.maxsize, plen - 1),)
+    runs = []
+    start = 0
+    lastind = get_color_index(0, 0, maxwidth, plen)
+    for pos in range(1, maxwidth):
+        colorind = get_color_index(pos, 0, maxwidth, plen)
+        if colorind != lastind:
+            runs.append((start, pos, lastind))
+            start, lastind = pos, colorind
+    if lastind == plen - 1:
+        runs.append((start, sys.maxsize, lastind))
+    else:
+        runs.append((start, maxwidth, lastind))
+        runs.append((maxwidth, sys.maxsize, plen - 1))
+    return tuple(runs)
+
+
+@lru_cache()
+def get_color_escapes(hicolor, bold):
+    ''' Escape sequences for each palette color, bold or not. '''
+    csi, csib, _, pal, rst, plen = get_palette(hicolor)
+    return tuple((csib if bold else csi) % color for color in pal)
+
+
 def rainbar(data, maxwidth, incolor=True, hicolor=True,
             cbrackets=('\u2595', '\u258F')):
-    ''' Creates a "rainbar" style bar graph. '''
-    if not data: return             # Nada to do
+    ''' Creates a "rainbar" style bar graph, returns a string. '''
+    if not data: return ''          # Nada to do
     datalen = len(data)
+    result = []
+    put = result.append
     endpcnt = data[-1][1]
     maxwidth = maxwidth - 2         # because of brackets
 
     # setup
     csi, csib, _, pal, rst, plen = get_palette(hicolor)
+    runs = get_color_runs(maxwidth, plen)
+    bolded = True
 
     empty = data[-1][0]
-    bucket = float(maxwidth) / plen
     position = 0
 
     # Print left bracket in correct color:
     if incolor:
-        out((csi % pal[0]) + cbrackets[0])  # start bracket
+        put((csi % pal[0]) + cbrackets[0])  # start bracket
     else:
-        out(cbrackets[0])
+        put(cbrackets[0])
 
     for i, part in enumerate(data):
         char, pcnt, fgcolor, bgcolor, bold = part
         if fgcolor and hicolor:
             fgcolor = map8[fgcolor]
         if not bold:
-            csib = csi
+            csib = csi              # stays that way for the rest
+            bolded = False
 
-        lastind = None
         width = int(maxwidth * (pcnt / 100.0))
         offset = position
         position += width
 
-        if incolor:
-            for j in range(width):
-                # faster?
-                colorind = fgcolor or min(int((j+offset)/bucket), (plen-1))
-                #~ colorind=fgcolor or get_color_index(j, offset,maxwidth,plen)
-                if colorind == lastind:
-                    out(char)
-                else:
-                    color = fgcolor or pal[colorind]
-                    out((csib % color) + char)
-                lastind = colorind
-        else:
-            out((char * width))
+        if incolor and width > 0:
+            if fgcolor:
+                put((csib % fgcolor) + (char * width))
+            else:                   # slice out of the prebuilt color runs
+                escapes = get_color_escapes(hicolor, bolded)
+                for start, end, colorind in runs:
+                    if end <= offset:
+                        continue
+                    if start >= position:
+                        break
+                    put(escapes[colorind] +
+                        char * (min(end, position) - max(start, offset)))
+        elif not incolor:
+            put((char * width))
 
         if i == (datalen - 1):          # check if last one correct
             if position < maxwidth:
                 rest = maxwidth - position
                 if incolor:
-                    out((csib % pal[-1]) + (empty * rest))
+                    put((csib % pal[-1]) + (empty * rest))
                 else:
-                    out(char * rest)
+                    put(char * rest)
             elif position > maxwidth:
-                out(chr(8) + ' ' + chr(8))  # backspace
+                put(chr(8) + ' ' + chr(8))  # backspace
 
     # Print right bracket in correct color:
     if incolor:
         lastcolor = darkred if (hicolor and endpcnt > 1) else pal[-1]
-        out((csi % lastcolor) + cbrackets[1])    # end bracket
-        colorend()
+        put((csi % lastcolor) + cbrackets[1])    # end bracket
+        put(colorend())
     else:
-        out(cbrackets[1])
+        put(cbrackets[1])
+    return ''.join(result)
+
+
+def get_restart(line, index):
+    ''' Find the last point at or before index where the text style is known
+        to be the default.  Returns the string index and its screen column.
+    '''
+    import re
+    start = 0
+    clean = True    # lines are painted after a reset
+    for match in re.finditer(r'\x1b\[[0-9;?]*[A-Za-z]', line):
+        if match.start() >= index:
+            break
+        seq = match.group()
+        if clean or seq.startswith(resets[2:]):
+            start = match.start()
+        if match.end() > index:     # differs inside this one
+            clean = False
+            break
+        clean = seq in resets[:2]
+    if clean:
+        start = index
+
+    text = re.sub(r'\x1b\[[0-9;?]*[A-Za-z]', '', line[:start])
+    if '\b' in text:                # backspaces, can't count on columns
+        return 0, 0
+    if any(ord(char) > 127 for char in text):  # double-width, same
+        from unicodedata import east_asian_width
+        if any(east_asian_width(char) in 'WF' for char in text):
+            return 0, 0
+    return start, len(text)
+
+
+def repaint(old, new):
+    ''' Returns the cursor addressing and text needed to turn a screen
+        showing the list of lines "old" into "new," rewriting only the lines
+        and trailing cells that changed.
+    '''
+    from os.path import commonprefix
+    result = []
+    oldlen = len(old)
+
+    for i, line in enumerate(new):
+        prev = old[i] if i < oldlen else ''
+        if line == prev:
+            continue
+        start, column = get_restart(line, len(commonprefix((prev, line))))
+        result.append(cur_pos % (i + 1, column + 1) + reset + line[start:] +
+                      erase_eol)
+
+    if oldlen > len(new):           # frame got shorter, clear the rest
+        result.append(cur_pos % (len(new) + 1, 1) + erase_eos)
+    return ''.join(result)
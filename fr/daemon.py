@@ -0,0 +1,220 @@
+'''
+    daemon.py - Resident daemon for fr.
+    License: GPLv3+.
+
+    Resident daemon and its client located here.  The daemon keeps warm
+    what every run of fr would rebuild: imports, the block device index,
+    compiled formatters, and the last snapshot.  A client sends its
+    terminal and arguments over a unix socket and writes back the frame:
+
+        request:    columns, lines, isatty, no_color, count of variables,
+                    variables as NAME=value, args… separated by NUL
+        response:   'ok\n' and the frame, or 'fallback\n'
+
+    The variables are TERM, LANG and LC_*, which shape the frame through the
+    daemon's own palette and locale, so it declines when they differ.  On
+    fallback, or when no daemon answers, the client runs in-process.
+    Modes that keep state or run on, e.g. --watch, are always run there.
+
+    usage: frd [-h] [--max-age #] [SOCKET]
+'''
+import os
+import sys
+from stat import S_ISSOCK
+
+
+# defaults
+client_timeout = 1.0    # secs before giving up on the daemon
+max_age = 1.0           # secs a snapshot is reused
+declined = ('watch', 'interval', 'serve_metrics', 'history', 'eta', 'io',
+            'debug', 'root', 'record', 'replay', 'exclude', 'include',
+            'filters')  # run in-process only
+_bufsize = 65536
+
+
+def get_socket_path():
+    ''' Returns the socket path, from $FR_SOCKET or the runtime dir, or None
+        where unix sockets aren't available.
+    '''
+    path = os.environ.get('FR_SOCKET')
+    if path or os.name != 'posix':
+        return path
+    rundir = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(rundir, f'frd-{os.getuid()}.sock')
+
+
+def get_env(environ=os.environ):
+    ''' Returns the variables a frame depends on, as sorted NAME=value. '''
+    return sorted(f'{name}={value}' for name, value in environ.items()
+                  if name in ('TERM', 'LANG') or name.startswith('LC_'))
+
+
+def query(args, termcols, termrows, isatty, no_color, path=None,
+          timeout=client_timeout):
+    ''' Ask the daemon to render a frame, returns it as bytes, or None to
+        run in-process.
+    '''
+    path = path or get_socket_path()
+    if not path:
+        return None
+    try:                # cheap, no daemon, and only ours, e.g. in /tmp
+        info = os.lstat(path)
+    except OSError:
+        return None
+    if not S_ISSOCK(info.st_mode) or info.st_uid != os.getuid():
+        return None
+
+    import socket
+    env = get_env()
+    request = '\0'.join([str(termcols), str(termrows), str(int(isatty)),
+                         str(int(no_color)), str(len(env))] + env + list(args))
+    chunks = []
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(request.encode('utf8', 'surrogateescape'))
+            sock.shutdown(socket.SHUT_WR)
+            while True:
+                chunk = sock.recv(_bufsize)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+    except OSError:
+        return None
+
+    status, _, frame = b''.join(chunks).partition(b'\n')
+    return frame if status == b'ok' else None
+
+
+class Daemon:
+    ''' Renders frames for clients, with the functions of the fr script,
+        passed in as its namespace.
+    '''
+    def __init__(self, script, max_age=max_age):
+        self.script = script
+        self.max_age = max_age
+        self.snapshots = {}     # collection settings: (time, snapshot)
+
+    def collect(self, opts):
+        ''' Returns a snapshot, shared by requests within max_age secs. '''
+        from time import monotonic
+        import fr
+
+        key = (opts.local, opts.all, opts.binds, opts.timeout, opts.container)
+        taken, snapshot = self.snapshots.get(key, (0, None))
+        if snapshot is None or monotonic() - taken > self.max_age:
+            snapshot = fr.collect(local_only=opts.local, show_all=opts.all,
+                                  show_binds=opts.binds,
+                                  timeout=opts.timeout,
+                                  container=opts.container)
+            self.snapshots[key] = monotonic(), snapshot
+        return snapshot
+
+    def render(self, request):
+        ''' Returns a rendered frame for a request, or None to decline. '''
+        import io
+        from contextlib import redirect_stderr, redirect_stdout
+        import fr
+
+        script = self.script
+        termcols, termrows, isatty, no_color, count, *args = (
+            request.split('\0'))
+        count = int(count)
+        if args[:count] != get_env():   # e.g. another locale or terminal
+            return None
+        args = args[count:]
+        try:
+            with redirect_stdout(io.StringIO()), \
+                 redirect_stderr(io.StringIO()):    # e.g. --help, errors
+                opts = script['parse_args'](args)
+        except SystemExit:
+            return None
+        if opts.format != 'text' or any(getattr(opts, name)
+                                        for name in declined):
+            return None
+
+        try:
+            opts = script['configure'](opts, int(termcols), int(termrows),
+                                       isatty == '1', no_color == '1')
+        except Exception:       # e.g. ColorNotAvail, let the client say so
+            return None
+        fr.load_config(opts)
+        opts.outunit, opts.unitstr = fr.get_units(opts.unit,
+                                                  binary=opts.binary)
+        try:
+            snapshot = self.collect(opts)
+        except OSError:
+            return None
+        return script['render'](opts, snapshot, **script['get_extras'](opts))
+
+    def handle(self, conn):
+        chunks = []
+        while True:
+            chunk = conn.recv(_bufsize)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        if not chunks:          # probed, e.g. by another frd starting
+            return
+        request = b''.join(chunks).decode('utf8', 'surrogateescape')
+        try:
+            frame = self.render(request)
+        except Exception as err:
+            print('render failed:', repr(err), file=sys.stderr)
+            frame = None
+        if frame is None:
+            conn.sendall(b'fallback\n')
+        else:
+            conn.sendall(b'ok\n' + frame.encode('utf8'))
+
+    def serve(self, path):
+        ''' Answer clients one at a time until interrupted. '''
+        import socket
+        from fr.utils import remove_stale
+
+        remove_stale(path)         # from a previous run
+
+        umask = os.umask(0o077)     # for the owner only
+        try:
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(path)
+        finally:
+            os.umask(umask)
+        try:
+            server.listen()
+            while True:
+                conn, _ = server.accept()
+                with conn:
+                    conn.settimeout(client_timeout)
+                    try:
+                        self.handle(conn)
+                    except OSError:
+                        pass
+        finally:
+            server.close()
+            os.unlink(path)
+
+
+def run(script, args):
+    ''' Entry point of the daemon. '''
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(prog='frd',
+                            usage=__doc__.split('usage: ')[1].strip())
+    parser.add_argument('socket', metavar='SOCKET', nargs='?',
+                        help='Where to listen, default: %s' %
+                        get_socket_path())
+    parser.add_argument('--max-age', type=float, default=max_age,
+                        metavar='#', help='Secs. a snapshot is reused.')
+    opts = parser.parse_args(args)
+    path = opts.socket or get_socket_path()
+
+    try:
+        Daemon(script, max_age=opts.max_age).serve(path)
+    except OSError as err:
+        print(f'Error: could not serve on {path}: {err}', file=sys.stderr)
+        return os.EX_UNAVAILABLE
+    except KeyboardInterrupt:
+        pass
+    return os.EX_OK
@@ -5,7 +5,7 @@
 
     Data gathering routines located here.
 '''
-import os, locale
+import os
 from os.path import basename, islink
 from fr.utils import DiskInfo, MemInfo, Info, run
 
@@ -21,8 +21,8 @@ col_lblw    = 'MOUNT CACHE'
 coloravail  = True
 hicolor     = None
 boldbar     = None
+locale_cat  = 'LC_ALL'
 TERM        = os.environ.get('TERM')
-locale.setlocale(locale.LC_ALL, '')
 
 if TERM == 'xterm-256color':
     hicolor     = True
@@ -54,18 +54,23 @@ def get_label_map(opts):
     return result
 
 
-def get_diskinfo(opts, show_all=False, debug=False, local_only=False):
-    ''' Returns a list holding the current disk info,
-        stats divided by the ouptut unit.
+def get_diskinfo(opts, show_all=False, debug=False, local_only=False,
+                 show_binds=False):
+    ''' Returns a list holding the current disk info, stats in bytes.
+        show_binds is accepted for compatibility, df lists each mount.
     '''
-    outunit = opts.outunit
     disks = []
+    mount_filter = getattr(opts, 'mount_filter', None)
+    keep = mount_filter and mount_filter.check
     try:
         label_map = get_label_map(opts)
         lines = run(diskcmd).splitlines()[1:]   # dump header
         for line in lines:
             tokens  = line.split()
             mntp = b' '.join(tokens[8:])
+            if keep and not keep('', tokens[0].decode('utf8'),
+                                 mntp.decode('utf8')):   # df has no type
+                continue
             dev = basename(tokens[0])
             disk = DiskInfo()
             if (dev in devfilter) or (mntp in mntfilter):
@@ -77,13 +82,12 @@ def get_diskinfo(opts, show_all=False, debug=False, local_only=False):
                 else:
                     continue
 
-            # convert to bytes as integer, then output units
+            # convert to bytes as integer
             disk.dev    = dev = dev.decode('ascii')
-            disk.ocap   = float(tokens[1]) * 1024
-            disk.cap    = disk.ocap / outunit
-            disk.free   = float(tokens[3]) * 1024 / outunit
+            disk.cap    = int(tokens[1]) * 1024
+            disk.free   = int(tokens[3]) * 1024
             disk.pcnt   = int(tokens[4][:-1])
-            disk.used   = float(tokens[2]) * 1024 / outunit
+            disk.used   = int(tokens[2]) * 1024
 
             disk.mntp   = mntp.decode('utf8')
             disk.label  = label_map.get(disk.mntp)
@@ -114,12 +118,11 @@ def get_diskinfo(opts, show_all=False, debug=False, local_only=False):
 
 
 def get_meminfo(opts):
-    ''' Returns a dictionary holding the current memory info,
-        divided by the ouptut unit.  If mem info can't be read, returns None.
+    ''' Returns a record holding the current memory info, in bytes.
+        If mem info can't be read, returns None.
         For Darwin / Mac OS X, interrogates the output of the sysctl and
         vm_stat utilities rather than /proc/meminfo
     '''
-    outunit = opts.outunit
     meminfo = MemInfo()
 
     sysinf = parse_sysctl(run(syscmd))
@@ -131,17 +134,17 @@ def get_meminfo(opts):
         print()
 
     # mem set
-    meminfo.memtotal = sysinf['hw.memsize'] / outunit
-    meminfo.memfree  = vmstat.free / outunit
-    meminfo.used     = (vmstat.wire + vmstat.active) / outunit
-    meminfo.cached   = (vmstat.inactive + vmstat.speculative) / outunit
+    meminfo.memtotal = int(sysinf['hw.memsize'])
+    meminfo.memfree  = int(vmstat.free)
+    meminfo.used     = int(vmstat.wire + vmstat.active)
+    meminfo.cached   = int(vmstat.inactive + vmstat.speculative)
     meminfo.buffers  = 0  # TODO: investigate
 
     # swap set
     swaptotal, swapused, swapfree = sysinf['vm.swapusage']
-    meminfo.swaptotal = swaptotal / outunit
-    meminfo.swapused  = swapused  / outunit
-    meminfo.swapfree  = swapfree  / outunit
+    meminfo.swaptotal = int(swaptotal)
+    meminfo.swapused  = int(swapused)
+    meminfo.swapfree  = int(swapfree)
     meminfo.swapcached = 0
 
     # alternative to calculating used:
@@ -0,0 +1,247 @@
+'''
+    export.py - JSON and Prometheus output for fr.
+    License: GPLv3+.
+
+    Machine-readable output routines located here.
+'''
+import json
+import sys
+
+
+def get_sample(snapshot):
+    ''' Returns a snapshot as plain data, byte counts as integers. '''
+    return {
+        'time': snapshot.timestamp,
+        'memory': snapshot.meminfo._asdict(),
+        'disks': [disk._asdict() for disk in snapshot.diskinfo],
+    }
+
+
+def dumps(snapshot, indent=None):
+    ''' Returns a snapshot as JSON text, compact on one line when indent is
+        None, suitable for NDJSON.
+    '''
+    separators = (',', ':') if indent is None else None
+    return json.dumps(get_sample(snapshot), indent=indent,
+                      separators=separators)
+
+
+# Prometheus text exposition
+metrics_interval = 15.0     # secs. between background collections
+metrics_ctype = 'text/plain; version=0.0.4; charset=utf-8'
+mem_metrics = (
+    # name,                     field,          description
+    ('fr_memory_total_bytes',   'memtotal',     'Total memory.'),
+    ('fr_memory_used_bytes',    'used',         'Memory in use by programs.'),
+    ('fr_memory_free_bytes',    'memfree',      'Unused memory.'),
+    ('fr_memory_cached_bytes',  'cached',       'Memory used by the page '
+                                                'cache.'),
+    ('fr_memory_buffers_bytes', 'buffers',      'Memory used by buffers.'),
+    ('fr_swap_total_bytes',     'swaptotal',    'Total swap space.'),
+    ('fr_swap_used_bytes',      'swapused',     'Swap space in use.'),
+    ('fr_swap_free_bytes',      'swapfree',     'Unused swap space.'),
+    ('fr_swap_cached_bytes',    'swapcached',   'Swap also held in memory.'),
+)
+disk_metrics = (
+    ('fr_filesystem_size_bytes', 'cap',     'Filesystem size.'),
+    ('fr_filesystem_used_bytes', 'used',    'Filesystem space in use.'),
+    ('fr_filesystem_avail_bytes', 'free',   'Filesystem space available to '
+                                            'non-root users.'),
+)
+
+
+def escape_label(value):
+    ''' Escape a label value for the text exposition format. '''
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+                      .replace('\n', '\\n'))
+
+
+def format_metrics(meminfo, diskinfo, stats=()):
+    ''' Returns memory and disk info in Prometheus text format.
+
+        stats - additional (name, type, description, value) tuples.
+    '''
+    lines = []
+    put = lines.append
+    for name, field, desc in mem_metrics:
+        value = getattr(meminfo, field, None)
+        if value is not None:
+            put(f'# HELP {name} {desc}')
+            put(f'# TYPE {name} gauge')
+            put(f'{name} {value}')
+
+    labels = []
+    for disk in diskinfo:
+        labels.append('device="%s",mountpoint="%s",fstype="%s",label="%s"' % (
+            escape_label(disk.dev), escape_label(disk.mntp),
+            escape_label(disk.fmt or ''), escape_label(disk.label or '')))
+
+    for name, field, desc in disk_metrics:
+        put(f'# HELP {name} {desc}')
+        put(f'# TYPE {name} gauge')
+        for disk, label in zip(diskinfo, labels):
+            value = getattr(disk, field)
+            if value is not None:  # not hung
+                put(f'{name}{{{label}}} {value}')
+
+    put('# HELP fr_filesystem_readonly Filesystem is mounted read-only.')
+    put('# TYPE fr_filesystem_readonly gauge')
+    for disk, label in zip(diskinfo, labels):
+        put(f'fr_filesystem_readonly{{{label}}} {int(disk.rw is False)}')
+
+    put('# HELP fr_filesystem_unresponsive Filesystem did not answer statvfs '
+        'in time.')
+    put('# TYPE fr_filesystem_unresponsive gauge')
+    for disk, label in zip(diskinfo, labels):
+        put(f'fr_filesystem_unresponsive{{{label}}} {int(bool(disk.ishung))}')
+
+    for name, kind, desc, value in stats:
+        put(f'# HELP {name} {desc}')
+        put(f'# TYPE {name} {kind}')
+        put(f'{name} {value}')
+
+    put('')
+    return '\n'.join(lines)
+
+
+class Collector:
+    ''' Collects in a background thread every interval seconds and keeps the
+        latest results rendered, so any number of scrapes share one set of
+        statvfs and /proc reads.
+    '''
+    def __init__(self, opts, interval=metrics_interval):
+        import threading
+
+        self.opts = opts
+        self.interval = interval
+        self.body = b''
+        self.count = 0
+        self.errors = 0
+        self.duration = 0.0     # of last collection
+        self.duration_sum = 0.0
+        self.last = 0.0         # timestamp of last success
+        self.snapshot = None    # last good results
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name='collector',
+                                        daemon=True)
+
+    def start(self):
+        self.update()           # have something ready for the first scrape
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            self.update()
+
+    def update(self):
+        ''' Collect and render once, keeps the last good results on error. '''
+        from time import perf_counter
+        from . import collect
+
+        opts = self.opts
+        start = perf_counter()
+        try:
+            snapshot = collect(local_only=opts.local, show_all=opts.all,
+                               show_binds=opts.binds, timeout=opts.timeout,
+                               debug=opts.debug, mount_filter=opts.filters,
+                               container=opts.container)
+        except Exception as err:
+            self.errors += 1
+            if opts.debug:
+                print('collection failed:', err, file=sys.stderr)
+            snapshot = None
+        self.duration = perf_counter() - start
+        self.duration_sum += self.duration
+        self.count += 1
+
+        if snapshot:
+            self.snapshot = snapshot
+            self.last = snapshot.timestamp
+        elif not self.snapshot:
+            return  # nothing to show yet
+
+        stats = (
+            ('fr_collection_duration_seconds', 'gauge',
+             'Duration of the last collection.', f'{self.duration:.6f}'),
+            ('fr_collection_duration_seconds_total', 'counter',
+             'Time spent collecting.', f'{self.duration_sum:.6f}'),
+            ('fr_collections_total', 'counter',
+             'Collections attempted.', self.count),
+            ('fr_collection_errors_total', 'counter',
+             'Collections that failed.', self.errors),
+            ('fr_last_collection_timestamp_seconds', 'gauge',
+             'Time of the last successful collection.', f'{self.last:.3f}'),
+        )
+        body = format_metrics(self.snapshot.meminfo, self.snapshot.diskinfo,
+                              stats).encode()
+        with self._lock:
+            self.body = body
+
+    def get_body(self):
+        with self._lock:
+            return self.body
+
+
+def get_address(text):
+    ''' Parse a HOST:PORT string, host may be empty or a [bracketed] IPv6
+        address.  Raises ValueError.
+    '''
+    host, sep, port = text.rpartition(':')
+    if not sep:
+        raise ValueError(f'expected HOST:PORT, got {text!r}')
+    host = host.strip('[]')
+    return host, int(port)
+
+
+def serve(opts, address, interval=metrics_interval):
+    ''' Serve metrics over HTTP at address until interrupted. '''
+    import socket
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+    collector = Collector(opts, interval=interval).start()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] == '/metrics':
+                body = collector.get_body()
+                if body:
+                    self.send_response(200)
+                    self.send_header('Content-Type', metrics_ctype)
+                else:
+                    body = b'collection failed\n'
+                    self.send_response(503)
+                    self.send_header('Content-Type', 'text/plain')
+            elif self.path == '/':
+                body = b'<a href="/metrics">metrics</a>\n'
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html')
+            else:
+                body = b'not found\n'
+                self.send_response(404)
+                self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if opts.debug:
+                super().log_message(format, *args)
+
+    class Server(ThreadingMixIn, HTTPServer):  # ThreadingHTTPServer is 3.7+
+        daemon_threads = True
+        if ':' in address[0]:
+            address_family = socket.AF_INET6
+
+    with Server(address, Handler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            collector.stop()
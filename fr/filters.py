@@ -0,0 +1,133 @@
+'''
+    filters.py - Mount filters for fr.
+    License: GPLv3+.
+
+    Mount filters located here.  A rule names a field of the mount line,
+    then a glob after =, or a regular expression, searched for, after ~:
+
+        type=overlay                    filesystem type
+        dev=/dev/loop*                  device
+        mnt~^/var/lib/kubelet/pods/     mount point
+
+    The rules of each field are compiled up front into a set of names, a
+    tuple of prefixes, and an expression for each of the rest, so a mount
+    costs a lookup or two per field whatever the number of plain rules, and
+    is dropped before anything else is done with it.  A file holds rules one
+    to a line after include or exclude, with # comments:
+
+        exclude type=overlay
+        exclude mnt=/run/*
+'''
+import re
+from fnmatch import translate
+
+
+# defaults
+fields = ('type', 'dev', 'mnt')     # order matches the arguments of check
+_wild  = re.compile(r'[*?[]')       # glob special characters
+
+
+def get_matcher(literals, prefixes, tests):
+    ''' Returns a function matching a value against plain names, looked up
+        in a set, names ending in *, by prefix, and the rest with a test per
+        rule, each expression compiled alone so its flags and groups keep to
+        itself.
+    '''
+    literals, prefixes = frozenset(literals), tuple(prefixes)
+    tests = tuple(tests)
+    if not (prefixes or tests):
+        return literals.__contains__
+
+    def match(value):
+        return (value in literals or value.startswith(prefixes) or
+                any(test(value) for test in tests))
+    return match
+
+
+def compile_rules(rules):
+    ''' Returns a match function per field, or None where it has no rules.
+        Raises ValueError on a malformed rule or expression.
+    '''
+    parts = { field: ([], [], []) for field in fields }
+    for rule in rules:
+        match = re.match(r'(\w+)([=~])(.*)$', rule, re.S)
+        if not match or match.group(1) not in parts:
+            raise ValueError(f'bad filter {rule!r}, expected one of '
+                             f'{", ".join(fields)} then = or ~ and a pattern')
+        field, kind, pattern = match.groups()
+        literals, prefixes, tests = parts[field]
+        if kind == '=':
+            if not _wild.search(pattern):
+                literals.append(pattern)
+            elif pattern.endswith('*') and not _wild.search(pattern[:-1]):
+                prefixes.append(pattern[:-1])
+            else:
+                tests.append(re.compile(translate(pattern)).match)
+        else:
+            try:
+                tests.append(re.compile(pattern).search)
+            except re.error as err:
+                raise ValueError(f'bad filter {rule!r}: {err}')
+
+    return tuple(get_matcher(*parts[field]) if any(parts[field]) else None
+                 for field in fields)
+
+
+class MountFilter:
+    ''' Decides which mounts to keep from their raw fields: kept when no
+        exclude rule matches, and any include rule does, if there are any.
+    '''
+    __slots__ = ('excludes', 'includes')
+
+    def __init__(self, exclude=(), include=()):
+        self.excludes = tuple((num, match) for num, match in
+                              enumerate(compile_rules(exclude)) if match)
+        self.includes = tuple((num, match) for num, match in
+                              enumerate(compile_rules(include)) if match)
+
+    def check(self, fmt, device, mntp):
+        ''' Returns whether to keep a mount. '''
+        values = (fmt, device, mntp)
+        for num, match in self.excludes:
+            if match(values[num]):
+                return False
+        if self.includes:
+            for num, match in self.includes:
+                if match(values[num]):
+                    return True
+            return False
+        return True
+
+
+def read_rules(path):
+    ''' Returns lists of exclude and include rules from a file. '''
+    exclude, include = [], []
+    with open(path, encoding='utf8') as infile:
+        for num, line in enumerate(infile, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            action, _, rule = line.partition(' ')
+            if action == 'exclude':
+                exclude.append(rule.strip())
+            elif action == 'include':
+                include.append(rule.strip())
+            else:
+                raise ValueError(f'{path}:{num}: expected include or '
+                                 f'exclude, found {action!r}')
+    return exclude, include
+
+
+def get_filter(exclude=(), include=(), path=None):
+    ''' Returns a MountFilter of the rules given and those in the file at
+        path, or None when there are none.  Raises ValueError on bad rules
+        and OSError if the file can't be read.
+    '''
+    exclude, include = list(exclude or ()), list(include or ())
+    if path:
+        more = read_rules(path)
+        exclude += more[0]
+        include += more[1]
+    if not (exclude or include):
+        return None
+    return MountFilter(exclude, include)
@@ -0,0 +1,322 @@
+'''
+    fleet.py - Agents and fleet queries for fr.
+    License: GPLv3+.
+
+    Agent and fleet modes located here.  An agent serves a snapshot as one
+    line of JSON to each connection on a unix or tcp socket, the fleet
+    client queries many agents at once and merges them into one table.
+
+    usage: fr agent [options] ADDRESS
+           fr fleet [options] ADDRESS [ADDRESS ...]
+
+    Addresses are HOST:PORT, or a path to a unix socket.
+'''
+import asyncio
+import json
+import os
+import sys
+from argparse import ArgumentParser
+from time import monotonic
+
+import fr
+from fr import ansi
+from fr.export import get_address as get_tcp_address, get_sample
+from fr.utils import remove_stale
+
+
+# defaults
+agent_max_age = 1.0     # secs a snapshot is shared by concurrent queries
+fleet_timeout = 5.0     # secs per host
+_colwidth     = 10
+
+
+def get_address(text):
+    ''' Returns a ('unix', path) or ('tcp', (host, port)) tuple. '''
+    if text.startswith('unix:'):
+        return 'unix', text[5:]
+    if '/' in text:
+        return 'unix', text
+    return 'tcp', get_tcp_address(text)
+
+
+class Agent:
+    ''' Answers each connection with a JSON snapshot.  Snapshots are reused
+        for max_age secs, so a burst of queries is served by one collection.
+    '''
+    def __init__(self, opts, max_age=agent_max_age):
+        self.opts = opts
+        self.max_age = max_age
+        self.payload = None
+        self.collected = 0.0
+        self.lock = None        # created in the loop
+
+    def collect(self):
+        opts = self.opts
+        snapshot = fr.collect(local_only=opts.local, show_all=opts.all,
+                              show_binds=opts.binds, timeout=opts.timeout,
+                              debug=opts.debug, mount_filter=opts.filters,
+                              container=opts.container)
+        return json.dumps(get_sample(snapshot), separators=(',', ':'))
+
+    async def get_payload(self):
+        async with self.lock:
+            if (self.payload is None or
+                monotonic() - self.collected > self.max_age):
+                loop = asyncio.get_event_loop()     # the running one
+                try:  # statvfs blocks, keep it out of the loop
+                    text = await loop.run_in_executor(None, self.collect)
+                except OSError as err:
+                    text = json.dumps({'error': str(err)})
+                self.payload = (text + '\n').encode()
+                self.collected = monotonic()
+            return self.payload
+
+    async def handle(self, reader, writer):
+        try:
+            writer.write(await self.get_payload())
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, address):
+        self.lock = asyncio.Lock()
+        kind, addr = address
+        if kind == 'unix':
+            remove_stale(addr)
+            return await asyncio.start_unix_server(self.handle, addr)
+        return await asyncio.start_server(self.handle, *addr)
+
+    def serve(self, address):
+        ''' Answer queries until interrupted. '''
+        loop = asyncio.new_event_loop()
+        try:
+            server = loop.run_until_complete(self.start(address))
+            try:
+                loop.run_forever()
+            finally:
+                server.close()
+                loop.run_until_complete(server.wait_closed())
+                kind, addr = address
+                if kind == 'unix' and os.path.exists(addr):
+                    os.unlink(addr)
+        finally:
+            loop.close()
+
+
+async def query(address, timeout):
+    ''' Returns the sample from one agent.  Raises OSError, ValueError or
+        asyncio.TimeoutError.
+    '''
+    kind, addr = address
+
+    async def fetch():
+        if kind == 'unix':
+            reader, writer = await asyncio.open_unix_connection(addr)
+        else:
+            reader, writer = await asyncio.open_connection(*addr)
+        try:
+            return await reader.read()  # until closed
+        finally:
+            writer.close()
+
+    sample = json.loads(await asyncio.wait_for(fetch(), timeout))
+    if 'error' in sample:
+        raise OSError(sample['error'])
+    return sample
+
+
+def run_async(coro):
+    ''' Run a coroutine to completion, as asyncio.run, new in Python 3.7. '''
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def query_all(addresses, timeout):
+    ''' Query all agents at once, returns a list of samples or exceptions. '''
+    return await asyncio.gather(*(query(address, timeout)
+                                  for address in addresses),
+                                return_exceptions=True)
+
+
+def get_rows(names, samples):
+    ''' Returns table rows, fullest first, unresponsive mounts last:
+        (pcnt, host, dev, mntp, cap, used, free)
+    '''
+    rows, hung = [], []
+    for name, sample in zip(names, samples):
+        if isinstance(sample, BaseException):
+            continue
+        mem = sample['memory']
+        if mem.get('memtotal'):
+            rows.append((mem['used'] / mem['memtotal'] * 100, name, 'RAM', '',
+                         mem['memtotal'], mem['used'], mem['memfree']))
+        for disk in sample['disks']:
+            if disk['ishung']:
+                hung.append((None, name, disk['dev'], disk['mntp'],
+                             None, None, None))
+            elif disk['cap']:   # not unmounted
+                rows.append((disk['pcnt'], name, disk['dev'], disk['mntp'],
+                             disk['cap'], disk['used'], disk['free']))
+    rows.sort(key=lambda row: row[0], reverse=True)
+    return rows + hung
+
+
+def print_table(opts, rows):
+    ''' Fleet table output function. '''
+    fmtstr, fmtval = fr.fmtstr, fr.fmtval
+    outunit = opts.outunit
+    pcnt_fmt = fr.get_fmtval(precision=0, spacing=False, end='')
+    hostwidth = min(max([ len(row[1]) for row in rows ] + [opts.colwidth]),
+                    opts.colwidth * 3)
+    fmt_host = fr.get_fmtstr(align='<', trunc='left', width=hostwidth)
+    buf = [f'\nFree Resources in Blocks of 1 {opts.unitstr}\n\n',
+           fmt_host('HOST'), fmtstr('DEVICE', align='<')]
+    for header in ('CAPACITY', 'USED', 'FREE', 'USE%'):
+        buf.append(fmtstr(header))
+    buf.append('MOUNT\n')
+
+    for pcnt, host, dev, mntp, cap, used, free in rows:
+        buf.append(fmt_host(host) + fmtstr(dev, align='<'))
+        if pcnt is None:
+            buf.append(fmtstr('unresponsive', fr.dim_templ, align='<',
+                              width=(opts.colwidth * 4) + 3))
+        else:
+            color = ansi.get_label_tmpl(pcnt, 100, opts.hicolor)
+            buf.append(fmtval(cap / outunit) +
+                       fmtval(used / outunit, color) +
+                       fmtval(free / outunit, color) +
+                       fmtstr(pcnt_fmt(pcnt) + '%', color))
+        buf.append(mntp + '\n')
+    fr.out(''.join(buf) + '\n')
+
+
+def parse_args(command, args):
+    ''' Parse command line options for agent and fleet modes. '''
+    parser = ArgumentParser(prog=f'fr {command}',
+                            usage=__doc__.split('usage: ')[1].split('\n\n')[0])
+    if command == 'agent':
+        parser.add_argument('address', metavar='ADDRESS',
+                            help='Where to listen, HOST:PORT or socket path.')
+        parser.add_argument('-a', '--all', action='store_true',
+                            help='Include unmounted devices and tmpfs mounts.')
+        parser.add_argument('-B', '--binds', action='store_true',
+                            help='List every bind mount and subvolume.')
+        parser.add_argument('--container', action='store_true',
+                            default=None, help='Report memory against the '
+                            'limit of the enclosing cgroup, default inside '
+                            'a container.')
+        parser.add_argument('-l', '--local', action='store_true',
+                            help='Include only local filesystems.')
+        parser.add_argument('-t', '--timeout', type=float, metavar='#',
+                            help='Secs. before a mount is marked '
+                            'unresponsive.')
+        parser.add_argument('--max-age', type=float, default=agent_max_age,
+                            metavar='#', help='Secs. a snapshot is reused.')
+        parser.add_argument('-x', '--exclude', action='append',
+                            metavar='RULE', help='Skip mounts matching a '
+                            'RULE, e.g. type=overlay.')
+        parser.add_argument('--include', action='append', metavar='RULE',
+                            help='Report only mounts matching a RULE.')
+        parser.add_argument('--filters', metavar='FILE',
+                            help='Read include and exclude rules from a '
+                            'FILE.')
+    else:
+        parser.add_argument('addresses', metavar='ADDRESS', nargs='+',
+                            help='Agents to query, HOST:PORT or socket path.')
+        parser.add_argument('-b', '--binary', action='store_true',
+                            help='Use binary units (2¹⁰).')
+        parser.add_argument('-f', '--format', choices=('text', 'json'),
+                            default='text', metavar='F',
+                            help='Output format: (text, json)')
+        parser.add_argument('-p', '--precision', type=int, default=-1,
+                            metavar='#', help='Set number of dec. places.')
+        parser.add_argument('-t', '--timeout', type=float,
+                            default=fleet_timeout, metavar='#',
+                            help='Secs. to wait for each host.')
+        parser.add_argument('-u', '--unit', choices=('b', 'k', 'm', 'g', 't'),
+                            default='g', metavar='U',
+                            help='Selects unit size: b, k, m, g, t')
+        parser.add_argument('--color', dest='incolor', metavar='...',
+                            choices=('auto', 'on', 'off'), default='auto',
+                            help='Color: (auto, on, off)')
+    parser.add_argument('-d', '--debug', action='store_true',
+                        help='Turns on verbose debugging output.')
+    return parser.parse_args(args)
+
+
+def agent(opts):
+    ''' Serve snapshots until interrupted. '''
+    from .filters import get_filter
+
+    pform = fr.get_pform()
+    pform.debug = opts.debug
+    try:
+        opts.filters = get_filter(opts.exclude, opts.include, opts.filters)
+    except (OSError, ValueError) as err:
+        print(f'Error: filters: {err}', file=sys.stderr)
+        return os.EX_USAGE
+    try:
+        address = get_address(opts.address)
+        Agent(opts, max_age=opts.max_age).serve(address)
+    except ValueError as err:
+        print(f'Error: {err}', file=sys.stderr)
+        return os.EX_USAGE
+    except OSError as err:
+        print(f'Error: could not serve on {opts.address}: {err}',
+              file=sys.stderr)
+        return os.EX_UNAVAILABLE
+    except KeyboardInterrupt:
+        pass
+    return os.EX_OK
+
+
+def fleet(opts):
+    ''' Query agents concurrently and print one merged table. '''
+    try:
+        addresses = [ get_address(text) for text in opts.addresses ]
+    except ValueError as err:
+        print(f'Error: {err}', file=sys.stderr)
+        return os.EX_USAGE
+
+    samples = run_async(query_all(addresses, opts.timeout))
+    failed = [ (name, sample) for name, sample in zip(opts.addresses, samples)
+               if isinstance(sample, BaseException) ]
+
+    if opts.format == 'json':
+        fr.out(json.dumps({
+            name: ({'error': str(sample) or type(sample).__name__}
+                   if isinstance(sample, BaseException) else sample)
+            for name, sample in zip(opts.addresses, samples)
+        }, indent=2) + '\n')
+    else:
+        opts.pform = fr.get_pform()
+        opts.colwidth = _colwidth
+        opts.hicolor = None
+        isatty = sys.stdout.isatty()
+        if opts.incolor == 'on' or (opts.incolor == 'auto' and isatty and
+                                    'NO_COLOR' not in os.environ):
+            opts.incolor = opts.pform.coloravail
+            opts.hicolor = opts.pform.hicolor if opts.incolor else None
+        else:
+            opts.incolor = False
+        fr.load_config(opts)
+        opts.outunit, opts.unitstr = fr.get_units(opts.unit,
+                                                  binary=opts.binary)
+        print_table(opts, get_rows(opts.addresses, samples))
+
+    for name, err in failed:
+        if isinstance(err, asyncio.TimeoutError):
+            err = f'no answer within {opts.timeout} secs'
+        print(f'{name}: {err}', file=sys.stderr)
+    return os.EX_UNAVAILABLE if failed else os.EX_OK
+
+
+def run(command, args):
+    ''' Entry point for the agent and fleet subcommands. '''
+    opts = parse_args(command, args)
+    return agent(opts) if command == 'agent' else fleet(opts)
@@ -0,0 +1,138 @@
+'''
+    forecast.py - Fill rate forecasts for fr.
+    License: GPLv3+.
+
+    Time-to-full forecasts located here.  The fill rate of each series is a
+    least-squares fit of bytes used over time, updated online as samples
+    arrive, with older samples fading by half every half-life.  A fit is a
+    handful of running sums, so each sample costs the same and memory stays
+    constant however long it runs.
+'''
+from math import inf
+
+from .utils import Record
+
+
+# defaults
+halflife    = 600.0     # secs, for the weight of a sample to halve
+min_samples = 3         # before a rate is believed
+horizon     = 365 * 86400   # secs, beyond which it's as good as never
+urgency     = (         # within secs, percent of the bar palette to use
+    (3600,      100),   # red
+    (86400,     80),    # orange
+    (604800,    60),    # yellow
+)
+
+
+class Fit(Record):
+    ''' Running, exponentially weighted least-squares sums of one series. '''
+    __slots__ = ('cap', 'count', 'last', 'weight', 'tmean', 'ymean',
+                 'tvar', 'tycov')
+
+    def __init__(self, cap):
+        self.cap = cap          # of the filesystem, a change starts over
+        self.count = 0
+        self.last = self.weight = self.tmean = self.ymean = 0.0
+        self.tvar = self.tycov = 0.0
+
+    def add(self, t, y, halflife=halflife):
+        ''' Fold in the sample y at time t. '''
+        if self.count:
+            if t <= self.last:
+                return
+            decay = 0.5 ** ((t - self.last) / halflife)
+        else:
+            decay = 0.0
+        self.count += 1
+        self.last = t
+        self.weight = weight = self.weight * decay + 1
+        dt = t - self.tmean
+        self.tmean += dt / weight
+        self.ymean += (y - self.ymean) / weight
+        self.tvar = self.tvar * decay + dt * (t - self.tmean)
+        self.tycov = self.tycov * decay + dt * (y - self.ymean)
+
+    def get_rate(self):
+        ''' Returns the slope of the fit, per sec., or None if unknown. '''
+        if self.count < min_samples or self.tvar <= 0:
+            return None
+        return self.tycov / self.tvar
+
+
+class Forecaster:
+    ''' Keeps a fit of used bytes per series, named as in the history
+        module: swap, or disk: and a mount point.  Series missing from a
+        snapshot are dropped, so state is bounded by what is mounted.
+    '''
+    def __init__(self, halflife=halflife):
+        self.halflife = halflife
+        self.fits = {}
+
+    def update(self, snapshot):
+        ''' Fold in the usage from a snapshot. '''
+        now = snapshot.timestamp
+        old, fits = self.fits, {}
+        meminfo = snapshot.meminfo
+        if meminfo.swaptotal:
+            self._add(old, fits, 'swap', meminfo.swaptotal, now,
+                      meminfo.swapused)
+        for disk in snapshot.diskinfo:
+            name = 'disk:' + disk.mntp
+            if disk.ishung:     # keep what was learned until it answers
+                if name in old:
+                    fits[name] = old[name]
+            elif disk.cap:
+                self._add(old, fits, name, disk.cap, now, disk.used)
+        self.fits = fits
+
+    def _add(self, old, fits, name, cap, now, used):
+        fit = old.get(name)
+        if fit is None or fit.cap != cap:
+            fit = Fit(cap)
+        fit.add(now, used, self.halflife)
+        fits[name] = fit
+
+    def get_eta(self, name, free):
+        ''' Returns secs until free bytes are used up at the current rate,
+            inf if not filling, or None if not known yet.
+        '''
+        if free <= 0:
+            return 0
+        fit = self.fits.get(name)
+        rate = fit and fit.get_rate()
+        if rate is None:
+            return None
+        if rate <= 0 or free / rate > horizon:
+            return inf
+        return free / rate
+
+
+def format_eta(secs):
+    ''' Returns a short rendering of a duration, e.g. 3d4h or 2h05m. '''
+    if secs is None:
+        return ''
+    if secs == inf:
+        return '∞'
+    secs = int(secs)
+    if secs <= 0:
+        return 'full'
+    if secs < 60:
+        return f'{secs}s'
+    mins, secs = divmod(secs, 60)
+    if mins < 60:
+        return f'{mins}m'
+    hours, mins = divmod(mins, 60)
+    if hours < 24:
+        return f'{hours}h{mins:02}m'
+    days, hours = divmod(hours, 24)
+    return f'{days}d{hours}h'
+
+
+def get_urgency(secs):
+    ''' Returns the percentage of the bar palette to color an eta with,
+        None if not filling.
+    '''
+    for within, level in urgency:
+        if secs <= within:
+            return level
+    return 0 if secs < inf else None
@@ -0,0 +1,195 @@
+'''
+    history.py - Usage history file for fr.
+    License: GPLv3+.
+
+    Usage history, in a fixed-size memory-mapped ring-buffer file, located
+    here.  Each series, RAM, swap or a mount point, keeps a ring of slots
+    per tier, consolidated RRD style from seconds to minutes to hours:
+
+        header | directory of series | series 0 | series 1 | ...
+
+    A slot is a bucket number (time // step), the average percentage used
+    in that bucket as a 16 bit fraction, and the count of samples averaged.
+    Slots left from an earlier lap of the ring are told apart by bucket, so
+    an append writes one slot per tier and the file never grows.  A series
+    only gives up its place after going unrecorded for stale_after secs,
+    when there are more than fit, the rest go unrecorded instead.
+'''
+import mmap
+import os
+import struct
+from hashlib import blake2b
+from time import time
+
+
+# defaults
+max_series  = 64
+tiers       = (         # step secs, slots
+    (1,     120),       # two minutes of seconds
+    (60,    120),       # two hours of minutes
+    (3600,  168),       # a week of hours
+)
+spark_span  = 3600      # secs, covered by a sparkline
+stale_after = 3600      # secs unrecorded, before a series may be replaced
+spark_width = 12
+sparks      = ' ▁▂▃▄▅▆▇█'
+scale       = 0xffff / 100  # percent to 16 bits
+
+_magic      = b'frh\x01'  # and version
+_header     = struct.Struct('<4sH' + 'IH' * len(tiers))
+_entry      = struct.Struct('<16sI')    # key digest, last update time
+_slot       = struct.Struct('<IHH')     # bucket, value, count
+_dir_start  = 64
+_data_start = _dir_start + max_series * _entry.size
+_offsets    = tuple(sum(slots for _, slots in tiers[:i])
+                    for i in range(len(tiers)))   # of each tier, in slots
+_stride     = sum(slots for _, slots in tiers) * _slot.size  # per series
+file_size   = _data_start + max_series * _stride
+header      = _header.pack(_magic, max_series,
+                           *(num for tier in tiers for num in tier))
+
+
+def get_key(name):
+    ''' Digest of a series name: ram, swap, or disk: and a mount point. '''
+    return blake2b(name.encode('utf8'), digest_size=16).digest()
+
+
+class History:
+    ''' A history file mapped into memory, created when new or empty, and
+        reset when written by another layout of this version.  Series are
+        named as in get_key.  Raises ValueError if the file is something
+        else, rather than overwrite it.
+    '''
+    def __init__(self, path, span=spark_span, width=spark_width):
+        self.span = span        # of sparklines
+        self.width = width
+        self.full_until = 0     # no series may be replaced until
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, len(_magic), 0) != _magic:
+                raise ValueError(f'{path!r} is not an fr history file')
+            if size != file_size:
+                os.ftruncate(fd, file_size)
+            self.map = mmap.mmap(fd, file_size)
+        finally:
+            os.close(fd)
+
+        if self.map[:len(header)] != header:    # new, or another layout
+            self.map[:] = bytes(file_size)
+            self.map[:len(header)] = header
+
+        self.index = {}     # key: series number
+        for num in range(max_series):
+            key, last = _entry.unpack_from(self.map,
+                                           _dir_start + num * _entry.size)
+            if last:
+                self.index[key] = num
+
+    def close(self):
+        self.map.close()
+
+    def get_series(self, key, now):
+        ''' Returns the number of a series by key digest, allocating a free
+            one, or the least recently updated if stale, for a new key.
+            Returns None when all are in use, rather than take turns.
+        '''
+        num = self.index.get(key)
+        if num is None:
+            if now < self.full_until:
+                return None
+            entries = [ _entry.unpack_from(self.map,
+                                           _dir_start + num * _entry.size)
+                        for num in range(max_series) ]
+            num = min(range(max_series), key=lambda num: entries[num][1])
+            last = entries[num][1]
+            if last and now - last < stale_after:
+                self.full_until = last + stale_after
+                return None
+            self.index.pop(entries[num][0], None)
+            start = _data_start + num * _stride
+            self.map[start:start + _stride] = bytes(_stride)
+            self.index[key] = num
+        return num
+
+    def append(self, name, value, now=None):
+        ''' Record value, a percentage, at time now.  Writes one slot per
+            tier, folding the value into the average of its bucket.
+        '''
+        now = int(time() if now is None else now)
+        key = get_key(name)
+        num = self.get_series(key, now)
+        if num is None:             # full
+            return
+        _entry.pack_into(self.map, _dir_start + num * _entry.size, key, now)
+        value = round(max(0, min(value, 100)) * scale)
+        base = _data_start + num * _stride
+
+        for (step, slots), offset in zip(tiers, _offsets):
+            bucket = now // step
+            pos = base + (offset + bucket % slots) * _slot.size
+            last_bucket, average, count = _slot.unpack_from(self.map, pos)
+            if last_bucket == bucket and count:
+                count = min(count + 1, 0xffff)
+                average = round(average + (value - average) / count)
+            else:
+                average, count = value, 1
+            _slot.pack_into(self.map, pos, bucket, average, count)
+
+    def add_snapshot(self, snapshot):
+        ''' Record memory and disk percentages used from a snapshot. '''
+        now = snapshot.timestamp
+        meminfo = snapshot.meminfo
+        if meminfo.memtotal:
+            self.append('ram', meminfo.used / meminfo.memtotal * 100, now)
+        if meminfo.swaptotal:
+            self.append('swap', meminfo.swapused / meminfo.swaptotal * 100,
+                        now)
+        for disk in snapshot.diskinfo:
+            if disk.cap:
+                self.append('disk:' + disk.mntp, disk.pcnt, now)
+
+    def get_trend(self, name, span=spark_span, width=spark_width, now=None):
+        ''' Returns width averages over the last span secs, from the finest
+            tier that covers it, None where nothing was recorded.
+        '''
+        num = self.index.get(get_key(name))
+        if num is None:
+            return [None] * width
+        now = int(time() if now is None else now)
+        for (step, slots), offset in zip(tiers, _offsets):
+            if step * slots >= span:
+                break
+        base = _data_start + num * _stride + offset * _slot.size
+        start = now - span
+
+        sums, counts = [0] * width, [0] * width
+        for bucket in range(start // step + 1, now // step + 1):
+            last_bucket, average, count = _slot.unpack_from(
+                self.map, base + (bucket % slots) * _slot.size)
+            if last_bucket == bucket and count:
+                col = min(max(bucket * step - start, 0) * width // span,
+                          width - 1)
+                sums[col] += average
+                counts[col] += 1
+        return [ (total / count / scale) if count else None
+                 for total, count in zip(sums, counts) ]
+
+    def get_sparkline(self, name, now=None):
+        ''' Returns the trend of a series, rendered as a sparkline. '''
+        return sparkline(self.get_trend(name, self.span, self.width, now))
+
+
+def sparkline(values, min_range=1.0):
+    ''' Render percentages as block characters scaled to their range, which
+        is at least min_range wide, so noise doesn't look like a trend.
+    '''
+    known = [ value for value in values if value is not None ]
+    if not known:
+        return ' ' * len(values)
+    low = min(known)
+    high = max(max(known), low + min_range)
+    top = len(sparks) - 2
+    return ''.join(' ' if value is None else
+                   sparks[1 + round((value - low) / (high - low) * top)]
+                   for value in values)
@@ -4,26 +4,60 @@
 
     Data gathering routines located here.
 '''
-import sys, os, locale
-from os.path import basename, join, normpath
-from fr.utils import DiskInfo, MemInfo
+import sys, os
+from os.path import basename, dirname, join, normpath
+from _thread import allocate_lock
+from time import monotonic
+from fr.utils import BlockDev, CGroupInfo, DiskInfo, IOStat, MemInfo
 
 
 # defaults
+cgroupdir   = '/sys/fs/cgroup'  # cgroup v2, unified hierarchy
+cgroupfname = '/proc/self/cgroup'
 diskdir     = '/dev/disk/by-label'
+diskstatsfname = '/proc/diskstats'
 encoding    = 'utf8'
 memfname    = '/proc/meminfo'
+partlabeldir = '/dev/disk/by-partlabel'
+uuiddir     = '/dev/disk/by-uuid'
+sysblockdir = '/sys/class/block'
+topology_ttl = 60.0         # secs before the block device index is rebuilt
 mntfname    = '/proc/mounts'
+mntinfofname = '/proc/self/mountinfo'
+nodedir     = '/sys/devices/system/node'
+rootdir     = ''            # prefix of the paths here, see set_root
 optical_fs  = ('iso9660', 'udf')
 selectors   = ('/', 'tmpfs', ':')
+stat_timeout = 2.0          # secs before a mount is considered unresponsive
+stat_workers = 16
+uptimefname = '/proc/uptime'
 col_lbls    = 'MNT CACHE'
 col_lblw    = 'MOUNT CACHE'
 coloravail  = True
 hicolor     = None
 boldbar     = None
+locale_cat  = 'LC_ALL'
 TERM        = os.environ.get('TERM')
 out         = sys.stdout.write
-locale.setlocale(locale.LC_ALL, '')
+_topology   = None          # cached block device index
+_memsampler = None          # keeps /proc/meminfo open
+_memlock    = allocate_lock()   # held while it's used, by any thread
+_hung       = {}            # path: start time, of statvfs calls abandoned
+_hunglock   = allocate_lock()
+_mycgroup   = None          # cgroup file read, memory limited group
+_paths      = None          # as above, before set_root
+_rooted     = ('cgroupdir', 'cgroupfname', 'diskdir', 'diskstatsfname',
+               'memfname', 'mntfname', 'mntinfofname', 'nodedir',
+               'partlabeldir', 'sysblockdir', 'uptimefname', 'uuiddir')
+meminfo_keys = {            # in /proc/meminfo: MemInfo field
+    'MemTotal':     'memtotal',
+    'MemFree':      'memfree',
+    'Buffers':      'buffers',
+    'Cached':       'cached',
+    'SwapCached':   'swapcached',
+    'SwapTotal':    'swaptotal',
+    'SwapFree':     'swapfree',
+}
 
 
 # icons
@@ -56,12 +90,33 @@ class ColorNotAvail(Exception):
         return f'{self.__class__.__name__}: {self.__doc__}'
 
 
-def check_optical(disk):
-    ''' Try to determine if a device is optical technology.
-        Needs improvement.
+def set_root(path):
+    ''' Read /proc, /sys and /dev below path, e.g. /host in a container
+        with the host's filesystem mounted there.  Mount points are stat'd
+        below it as well, and the mounts and cgroup are those of its init,
+        as /proc/self there is still this process.
+    '''
+    global _paths, _topology, rootdir
+    module = globals()
+    if _paths is None:
+        _paths = { name: module[name] for name in _rooted }
+    rootdir = path.rstrip('/')
+    for name, value in _paths.items():
+        if rootdir and value.startswith('/proc/self/'):
+            value = '/proc/1/' + value[11:]
+        module[name] = rootdir + value
+    _topology = None
+
+
+def check_optical(disk, topology=None):
+    ''' Try to determine if a device is optical technology, from sysfs when
+        a topology is given, else guessing from names.
     '''
     dev = disk.dev
-    if dev.startswith('sr') or ('cd' in dev):
+    blockdev = topology and topology.devices.get(dev)
+    if blockdev and blockdev.isopt:
+        return True
+    elif dev.startswith('sr') or ('cd' in dev):
         return True
     elif disk.fmt in optical_fs:
         return True
@@ -71,17 +126,11 @@ def check_optical(disk):
 
 def check_removable(dev, opts):
     ''' Removable drives can be identified under /sys. '''
-    try:  # get parent device from sys filesystem, look from right.  :-/
-        parent = os.readlink(f'/sys/class/block/{dev}').rsplit("/", 2)[1]
-        with open(f'/sys/block/{parent}/removable') as f:
-            return f.read() == '1\n'
-
-    except IndexError as err:
-        if opts.debug:
-            print('ERROR: parent block device not found.', err)
-    except IOError as err:
-        if opts.debug:
-            print('ERROR:', err)
+    blockdev = get_topology(opts).devices.get(dev)
+    if blockdev:
+        return blockdev.isrem
+    if opts.debug:
+        print('ERROR: block device not found:', dev)
 
 
 def decode_mntp(mntp):
@@ -102,39 +151,344 @@ def decode_mntp(mntp):
 
 def get_label_map(opts):
     ''' Find volume labels from filesystem and return in dict format. '''
+    results = get_topology(opts).labels
+    if opts.debug:
+        print('\n\nlabel_map:', results)
+    return results
+
+
+def get_topology(opts, max_age=topology_ttl):
+    ''' Returns the block device index, rebuilt when older than max_age
+        secs, so long running modes reuse it between refreshes.
+    '''
+    global _topology
+    if _topology is None or monotonic() - _topology.built > max_age:
+        _topology = Topology()
+        if opts.debug:
+            print('\n\ntopology:', _topology.devices)
+    return _topology
+
+
+def read_links(dirname):
+    ''' Returns a dict of target device path: decoded link name, for the
+        symlinks in a /dev/disk/by-* folder.
+    '''
     results = {}
     try:
-        for entry in os.scandir(diskdir):
-            target = normpath(join(diskdir, os.readlink(entry.path)))
+        for entry in os.scandir(dirname):
+            target = normpath(join(dirname, os.readlink(entry.path)))
+            if target.startswith(rootdir + '/'):    # as named in mounts
+                target = target[len(rootdir):]
             decoded_name = entry.name.encode('utf8').decode('unicode_escape')
             results[target] = decoded_name
-        if opts.debug:
-            print('\n\nlabel_map:', results)
     except FileNotFoundError:
         pass
     return results
 
 
-def get_diskinfo(opts, show_all=False, local_only=False):
-    ''' Returns a list holding the current disk info.
-        Stats are divided by the outputunit.
+def read_sysattr(path):
+    ''' Returns the stripped contents of a sysfs attribute, or None. '''
+    try:
+        with open(path) as infile:
+            return infile.read().strip()
+    except OSError:
+        return None
+
+
+class Topology:
+    ''' Index of block devices by kernel name, and device mapper name, built
+        in one pass over /sys/class/block, with the /dev/disk/by-label,
+        by-uuid and by-partlabel maps merged in.
     '''
-    disks = []
-    outunit = opts.outunit
-    label_map = get_label_map(opts)
+    __slots__ = ('built', 'devices', 'labels')
+
+    def __init__(self):
+        self.built = monotonic()
+        self.devices = devices = {}
+        try:
+            entries = list(os.scandir(sysblockdir))
+        except OSError:
+            entries = ()
+
+        for entry in entries:
+            path = entry.path
+            try:  # partitions link below their disk: .../block/sda/sda1
+                parent = os.readlink(path).rsplit('/', 2)[-2]
+            except (OSError, IndexError):
+                continue
+            dev = devices[entry.name] = BlockDev(
+                dev=entry.name,
+                parent=None if parent == 'block' else parent,
+            )
+            size = read_sysattr(f'{path}/size')
+            if size and size.isdigit():
+                dev.size = int(size) * 512      # always in 512 byte sectors
+            if dev.parent:
+                continue                        # inherits, below
+
+            dev.isrem = read_sysattr(f'{path}/removable') == '1'
+            dev.isrot = read_sysattr(f'{path}/queue/rotational') == '1'
+            dev.isopt = read_sysattr(f'{path}/device/type') == '5'  # scsi rom
+            if entry.name.startswith('dm-'):
+                dev.kind = 'dm'
+                dev.name = read_sysattr(f'{path}/dm/name')
+            elif entry.name.startswith('md'):
+                dev.kind = 'md'
+            if dev.kind:
+                try:
+                    dev.slaves = tuple(sorted(os.listdir(f'{path}/slaves')))
+                except OSError:
+                    pass
+
+        for dev in list(devices.values()):
+            disk = devices.get(dev.parent)
+            if disk:
+                dev.isrem, dev.isrot, dev.isopt = (disk.isrem, disk.isrot,
+                                                   disk.isopt)
+            if dev.name:                        # /dev/mapper/vg-root
+                devices.setdefault(dev.name, dev)
+
+        self.labels = read_links(diskdir)       # by path, mounted or not
+        for attr, dirname, links in (('label', diskdir, self.labels),
+                                     ('uuid', uuiddir, None),
+                                     ('partlabel', partlabeldir, None)):
+            for target, value in (links or read_links(dirname)).items():
+                dev = devices.get(basename(target))
+                if dev:
+                    setattr(dev, attr, value)
+
+
+def parse_mountinfo(lines, keep=None):
+    ''' Parse lines of mountinfo into a list of mount tuples:
+        (device, mntp, fmt, mntops, fsid, root), where fsid is the
+        major:minor of the superblock, shared by bind mounts and subvolumes
+        of the same filesystem, and root the part of it mounted.
+        Lines are skipped early unless keep(fmt, device, mntp), if given.
+        https://www.kernel.org/doc/Documentation/filesystems/proc.txt
+    '''
+    mounts = []
+    for line in lines:
+        # id parent major:minor root mntp mntops [optional ...] - fmt dev sops
+        fields = line.rstrip('\n').split(' ')  # keep empty fields in place
+        try:
+            sep = fields.index('-', 6)
+            device, mntp, fmt = fields[sep + 2], fields[4], fields[sep + 1]
+        except (ValueError, IndexError):
+            continue    # malformed
+        if keep and not keep(fmt, device,
+                             decode_mntp(mntp) if '\\' in mntp else mntp):
+            continue
+        mounts.append((device, mntp, fmt, fields[5], fields[2], fields[3]))
+    return mounts
+
+
+def read_mounts(keep=None):
+    ''' Returns a list of mount tuples from mountinfo, falling back to
+        /proc/mounts, without fsid or root, where not available.
+        Returns None if neither could be read.
+    '''
+    try:
+        with open(mntinfofname) as infile:
+            return parse_mountinfo(infile, keep)
+    except IOError:
+        pass
 
-    # get mount info
     try:
         with open(mntfname) as infile:
-            lines = infile.readlines()
-            lines.sort()
+            mounts = [ (*line.split()[:4], None, None) for line in infile ]
     except IOError:
         return None
+    if keep:
+        mounts = [ mount for mount in mounts    # device, mntp, fmt, …
+                   if keep(mount[2], mount[0], decode_mntp(mount[1])
+                           if '\\' in mount[1] else mount[1]) ]
+    return mounts
+
+
+def stat_mounts(mntps, timeout=stat_timeout, workers=stat_workers):
+    ''' Run os.statvfs on mount points concurrently, on a small pool of
+        daemon threads, so one stale network mount can't hang the run.
+        Returns a dict of mount point: result, where the result is None for
+        mounts that didn't answer within timeout secs, or the OSError raised.
+
+        A worker stuck in a dead mount is abandoned and replaced, so the
+        remaining mounts still get their full timeout each.  Until it
+        returns, later calls report the mount as hung straight away rather
+        than leave another thread stuck behind it.
+    '''
+    import threading
+    from collections import deque
+    from time import monotonic
 
-    # build list of disks
-    for i, line in enumerate(lines):
-        device, mntp, fmt, mntops, *_ = line.split()
+    results = {}
+    with _hunglock:
+        for mntp in mntps:
+            if rootdir + mntp in _hung:
+                results[mntp] = None
+    pending = deque(mntp for mntp in dict.fromkeys(mntps)  # unique, in order
+                    if mntp not in results)
+    total = len(pending) + len(results)
+    started = {}                    # mntp: start time, while in progress
+    cond = threading.Condition()
+
+    def worker():
+        while True:
+            with cond:
+                if not pending:
+                    return
+                mntp = pending.popleft()
+                started[mntp] = monotonic()
+            try:
+                result = os.statvfs(rootdir + mntp)
+            except OSError as err:
+                result = err
+            with cond:
+                if started.pop(mntp, None) is None:
+                    with _hunglock:     # answered at last
+                        _hung.pop(rootdir + mntp, None)
+                    return          # gave up on us, replacement running
+                results[mntp] = result
+                cond.notify()
+
+    def spawn():
+        threading.Thread(target=worker, daemon=True).start()
+
+    for _ in range(min(workers, len(pending))):
+        spawn()
+
+    with cond:
+        while len(results) < total:
+            now = monotonic()
+            for mntp, start in list(started.items()):
+                if now - start >= timeout:  # abandon it
+                    del started[mntp]
+                    results[mntp] = None
+                    with _hunglock:
+                        _hung[rootdir + mntp] = start
+                    if pending:
+                        spawn()
+            if started:
+                cond.wait(min(started.values()) + timeout - now)
+            elif pending:
+                cond.wait(timeout)  # about to start
+    return results
 
+
+def read_diskstats():
+    ''' Returns a dict of kernel device name: (reads, sectors read, ms
+        reading, writes, sectors written, ms writing, in flight), from one
+        read of /proc/diskstats.
+    '''
+    results = {}
+    with open(diskstatsfname) as infile:
+        for line in infile:     # major minor name reads merged sectors ms …
+            tokens = line.split()
+            if len(tokens) >= 14:
+                results[tokens[2]] = (
+                    int(tokens[3]), int(tokens[5]), int(tokens[6]),
+                    int(tokens[7]), int(tokens[9]), int(tokens[10]),
+                    int(tokens[11]),
+                )
+    return results
+
+
+class DiskStats:
+    ''' Block device rates from successive reads of /proc/diskstats, keeping
+        the previous counts between refreshes.  The first is averaged over
+        the time since boot, as iostat does.
+    '''
+    _zeros = (0,) * 7
+
+    def __init__(self):
+        self.counts = None
+        self.taken = None       # monotonic time of counts
+        self.rates = {}
+        self.topology = None
+
+    def update(self, opts):
+        ''' Read the counts and figure rates since the last update. '''
+        now = monotonic()
+        try:
+            counts = read_diskstats()
+        except OSError as err:
+            if opts.debug:
+                print('\n\ndiskstats:', err)
+            return
+
+        if self.counts is None:
+            previous = {}
+            try:
+                with open(uptimefname) as infile:
+                    elapsed = float(infile.read().split()[0])
+            except (OSError, IndexError, ValueError):
+                elapsed = 0
+        else:
+            previous, elapsed = self.counts, now - self.taken
+
+        rates = {}
+        if elapsed > 0:
+            zeros = self._zeros
+            for dev, current in counts.items():
+                before = previous.get(dev, zeros)
+                if current[0] < before[0] or current[3] < before[3]:
+                    before = zeros          # reset, e.g. device re-added
+                reads, rsectors, rms, writes, wsectors, wms, _ = (
+                    count - last for count, last in zip(current, before))
+                ios = reads + writes
+                rates[dev] = IOStat(
+                    dev=dev,
+                    rbytes=rsectors * 512 / elapsed,  # always 512 byte units
+                    wbytes=wsectors * 512 / elapsed,
+                    iops=ios / elapsed,
+                    latency=(rms + wms) / ios if ios else 0.0,
+                    inflight=current[6],
+                )
+        self.counts, self.taken, self.rates = counts, now, rates
+        self.topology = get_topology(opts)
+
+    def get(self, dev):
+        ''' Returns the IOStat of a short device name, as in DiskInfo.dev,
+            falling back to its whole disk, or None.
+        '''
+        stat = self.rates.get(dev)
+        if stat is None and self.topology:
+            blockdev = self.topology.devices.get(dev)   # e.g. mapper name
+            if blockdev:
+                stat = (self.rates.get(blockdev.dev) or
+                        self.rates.get(blockdev.parent))
+        return stat
+
+
+def get_diskinfo(opts, show_all=False, local_only=False, show_binds=False):
+    ''' Returns a list holding the current disk info, stats in bytes.
+        Mounts sharing a filesystem, e.g. bind mounts and subvolumes, are
+        stat'd once and collapsed to one row, unless show_binds is set.
+    '''
+    disks = []
+    topology = get_topology(opts)
+    label_map = get_label_map(opts)
+    mount_filter = getattr(opts, 'mount_filter', None)
+    keep = mount_filter and mount_filter.check
+    dropped = set()                     # devices of filtered out mounts
+    if keep and show_all:               # aren't unmounted, note them
+        check = keep
+
+        def keep(fmt, device, mntp):
+            if check(fmt, device, mntp):
+                return True
+            dropped.add(basename(device))
+            return False
+
+    mounted = []                        # disk, mount options, fs id, root
+
+    # get mount info
+    mounts = read_mounts(keep)
+    if mounts is None:
+        return None
+    mounts.sort()
+
+    # build list of disks
+    for device, mntp, fmt, mntops, fsid, root in mounts:
         if device in ('cgroup',):       # never want these
             continue
 
@@ -165,21 +519,48 @@ def get_diskinfo(opts, show_all=False, local_only=False):
         disk.fmt = fmt
         disk.mntp = mntp = decode_mntp(mntp) if '\\' in mntp else mntp
         disk.ismntd = bool(mntp)
-        disk.isopt = check_optical(disk)
+        disk.isopt = check_optical(disk, topology)
         if device[0] == '/':  # .startswith('/dev'):
             disk.isrem = check_removable(dev, opts)
         disk.label = label_map.get(device)
+        if disk.label is None and dev in topology.devices:  # e.g. mapper
+            disk.label = topology.devices[dev].label
+
+        mounted.append((disk, mntops, fsid or mntp, root))
+
+    # group by filesystem, one mount of each stands in for the rest,
+    # preferably the whole fs at the shortest path
+    stand_ins = {}
+    for disk, _, fsid, root in mounted:
+        key = (root != '/', len(disk.mntp))
+        if fsid not in stand_ins or key < stand_ins[fsid][0]:
+            stand_ins[fsid] = key, disk
+    stand_ins = { fsid: disk for fsid, (_, disk) in stand_ins.items() }
+
+    # get disk usage information, concurrently
+    # http://pubs.opengroup.org/onlinepubs/009695399/basedefs/sys/statvfs.h.html
+    timeout = getattr(opts, 'timeout', None) or stat_timeout
+    stats = stat_mounts([ disk.mntp for disk in stand_ins.values() ],
+                        timeout=timeout)
+    for disk, mntops, fsid, _ in mounted:
+        stand_in = stand_ins[fsid]
+        if not show_binds and disk is not stand_in:
+            continue
+        stat = stats[stand_in.mntp]
+        if stat is None:                        # stale network mount, etc.
+            disk.ishung = True
+            disks.append(disk)
+            continue
+        elif isinstance(stat, OSError):
+            if opts.debug:
+                print('ERROR:', stat)
+            continue
 
-        # get disk usage information
-        # http://pubs.opengroup.org/onlinepubs/009695399/basedefs/sys/statvfs.h.html
-        # convert to bytes, then output units
-        stat = os.statvfs(mntp)
-        disk.ocap  = stat.f_frsize * stat.f_blocks     # keep for later
-        disk.cap   = disk.ocap / outunit
-        disk.free  = stat.f_frsize * stat.f_bavail / outunit
-        disk.oused = stat.f_frsize * (stat.f_blocks - stat.f_bfree) # for later
-        disk.used  = disk.oused / outunit
-        disk.pcnt  = disk.oused / disk.ocap * 100
+        # convert to bytes
+        disk.cap   = stat.f_frsize * stat.f_blocks
+        disk.free  = stat.f_frsize * stat.f_bavail
+        disk.used  = stat.f_frsize * (stat.f_blocks - stat.f_bfree)
+        disk.pcnt  = disk.used / disk.cap * 100
         if mntops.startswith('rw'):             # read only
             disk.rw = True
         elif mntops.startswith('ro'):
@@ -190,23 +571,29 @@ def get_diskinfo(opts, show_all=False, local_only=False):
         disks.append(disk)
 
     if show_all:    # look at /dev/disks again for the unmounted
-        for devname in label_map:
+        found = { disk.dev for disk in disks } | dropped
+        unmounted = []
+        for devname, label in label_map.items():
             dev = basename(devname)
-            exists = [ disk for disk in disks if disk.dev == dev ]
-            if not exists:
-                disk = DiskInfo(
-                    cap=0, free=0, ocap=0, pcnt=0, used=0,
+            if mount_filter and not mount_filter.check('', devname, ''):
+                continue
+            if dev not in found:
+                found.add(dev)
+                unmounted.append(DiskInfo(
+                    cap=0, free=0, pcnt=0, used=0,
                     dev = dev,
                     ismntd = False, mntp = '',
                     isnet = False,
-                    isopt = check_optical(DiskInfo(dev=dev, fmt=None)),
+                    isopt = check_optical(DiskInfo(dev=dev, fmt=None),
+                                          topology),
                     isram = False,   # no such thing?
                     isrem = check_removable(dev, opts),
-                    label = label_map[devname],
+                    label = label,
                     rw = None,
-                )
-                disks.append(disk)
-                disks.sort(key=lambda disk: disk.dev)  # sort again :-/
+                ))
+        if unmounted:
+            disks.extend(unmounted)
+            disks.sort(key=lambda disk: disk.dev)  # once, stable
 
     if opts.debug:
         print()
@@ -216,37 +603,287 @@ def get_diskinfo(opts, show_all=False, local_only=False):
     return disks
 
 
-def get_meminfo(opts):
-    ''' Returns a dictionary holding the current memory info,
-        divided by the ouptut unit.  If mem info can't be read, returns None.
+class MemSampler:
+    ''' Samples /proc/meminfo through a descriptor kept open, re-read with
+        pread into a fresh buffer each time.  Only the keys asked for are
+        parsed, each found with one search from a table built up front.
     '''
-    meminfo = MemInfo()
-    outunit = opts.outunit
-    try:
-        with open(memfname) as infile:
-            lines = infile.readlines()
-    except IOError:
-        return None
-
-    for line in lines:                      # format: 'MemTotal:  511456 kB\n'
-        tokens = line.split()
-        if tokens:
-            name, value = tokens[0][:-1].lower(), tokens[1]  # rm :
-            if len(tokens) == 2:
-                continue
-            unit = tokens[2].lower()
+    def __init__(self, keys=tuple(meminfo_keys), path=None):
+        self.path = path or memfname
+        self.keys = keys
+        self.table = tuple((b'\n' + key.encode() + b':', key) for key in keys)
+        self.size = 4096
+        self.fd = os.open(self.path, os.O_RDONLY)
+
+    def close(self):
+        os.close(self.fd)
+
+    def read(self):
+        ''' Returns a dict of the keys asked for, in bytes. '''
+        while True:
+            size = self.size
+            data = os.pread(self.fd, size, 0)
+            if len(data) < size:
+                break
+            self.size = size * 2    # didn't fit, may have grown
+
+        buf = b'\n' + data          # newline, so the first key matches too
+        results = {}
+        for tag, key in self.table:  # format: '\nMemTotal:  511456 kB'
+            pos = buf.find(tag)
+            if pos >= 0:
+                start = pos + len(tag)
+                tokens = buf[start:buf.find(b'\n', start)].split()
+                results[key] = int(tokens[0]) * (1024 if len(tokens) > 1
+                                                 else 1)  # kB, or a count
+        return results
 
-            # parse_result to bytes  TODO
-            value = int(value)
-            if   unit == 'kb': value = value * 1024  # most likely
-            elif unit ==  'b': value = value
-            elif unit == 'mb': value = value * 1024 * 1024
-            elif unit == 'gb': value = value * 1024 * 1024 * 1024
 
-            setattr(meminfo, name, value / outunit)
+def get_meminfo(opts):
+    ''' Returns a record holding the current memory info, in bytes.
+        If mem info can't be read, returns None.
+    '''
+    global _memsampler
+    with _memlock:
+        try:
+            if _memsampler is None or _memsampler.path != memfname:
+                if _memsampler:     # e.g. moved below a root
+                    _memsampler.close()
+                    _memsampler = None
+                _memsampler = MemSampler()
+            values = _memsampler.read()
+        except (OSError, IndexError, ValueError):
+            if _memsampler:
+                try:
+                    _memsampler.close()
+                except OSError:
+                    pass
+                _memsampler = None
+            return None
+
+    meminfo = MemInfo(**{ meminfo_keys[key]: value
+                          for key, value in values.items() })
+    for field in meminfo_keys.values():     # missing, e.g. no swap
+        if getattr(meminfo, field) is None:
+            setattr(meminfo, field, 0)
 
     cache = meminfo.cached + meminfo.buffers
     meminfo.used = meminfo.memtotal - meminfo.memfree - cache
     meminfo.swapused = (meminfo.swaptotal - meminfo.swapcached -
                         meminfo.swapfree)
+
+    container = getattr(opts, 'container', None)    # None: if detected
+    cgroup = container is not False and get_memcgroup(anywhere=bool(container))
+    if cgroup and cgroup[1] < meminfo.memtotal:     # e.g. in a container
+        if opts.debug:
+            print('\n\nmemory cgroup:', cgroup)
+        apply_memcgroup(meminfo, *cgroup)
     return meminfo
+
+
+def get_numainfo(opts):
+    ''' Returns a sorted list of (node number, MemInfo) for each NUMA node
+        with memory, from one read of each node's meminfo, in bytes.
+    '''
+    wanted = ('MemTotal:', 'MemFree:', 'FilePages:')
+    results = []
+    try:
+        entries = list(os.scandir(nodedir))
+    except OSError:
+        return results
+
+    for entry in entries:
+        name = entry.name
+        if not (name.startswith('node') and name[4:].isdigit()):
+            continue
+        try:
+            with open(entry.path + '/meminfo') as infile:
+                lines = infile.readlines()
+        except OSError:
+            continue
+
+        values = {}
+        for line in lines:          # format: 'Node 0 MemTotal:  4947704 kB'
+            tokens = line.split()
+            if len(tokens) == 5 and tokens[2] in wanted:
+                values[tokens[2]] = int(tokens[3]) * 1024
+        total = values.get('MemTotal:')
+        if not total:               # cpu only node
+            continue
+        free, cached = values.get('MemFree:', 0), values.get('FilePages:', 0)
+        results.append((int(name[4:]), MemInfo(
+            buffers=0, cached=cached, memfree=free, memtotal=total,
+            used=max(total - free - cached, 0),
+        )))
+
+    results.sort(key=lambda result: result[0])
+    if opts.debug:
+        print('\n\nnuma nodes:', results)
+    return results
+
+
+def read_int(path):
+    ''' Returns an integer attribute from sysfs or cgroupfs, or None when
+        missing or "max."  Skips the overhead of open(), for big scans.
+    '''
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        return int(os.read(fd, 64))
+    except (OSError, ValueError):
+        return None
+    finally:
+        os.close(fd)
+
+
+def read_keyed(path, keys):
+    ''' Returns the wanted keys of a flat keyed file, e.g. memory.stat. '''
+    results = {}
+    try:
+        with open(path) as infile:
+            for line in infile:
+                key, _, value = line.partition(' ')
+                if key in keys:
+                    results[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return results
+
+
+def get_memcgroup(anywhere=False):
+    ''' Returns the path of the cgroup v2 group around this process with
+        the tightest memory limit, and the limit, or None if unlimited.
+        Unless anywhere is set, only looks inside a cgroup namespace, e.g.
+        a container, where the root group has a memory.max, unlike a host's.
+        The group is found once, then only its limit is read again.
+    '''
+    global _mycgroup
+    key = cgroupfname, anywhere
+    if _mycgroup is None or _mycgroup[0] != key:
+        path = None
+        if anywhere or os.path.exists(join(cgroupdir, 'memory.max')):
+            path = find_memcgroup()
+        _mycgroup = key, path               # rarely moves, found once
+    path = _mycgroup[1]
+    if path is None:
+        return None
+    limit = read_int(join(path, 'memory.max'))
+    return None if limit is None else (path, limit)
+
+
+def find_memcgroup():
+    ''' Returns the path of the group around this process, or an ancestor,
+        with the tightest memory limit, or None.
+    '''
+    path = None
+    try:
+        with open(cgroupfname) as infile:
+            lines = infile.read().splitlines()
+    except OSError:
+        lines = ()
+    for line in lines:                      # format: '0::/user.slice/…'
+        if line.startswith('0::'):          # else v1 only
+            path = normpath(join(cgroupdir, line[3:].lstrip('/')))
+            break
+    if path is None:
+        return None
+
+    result, tightest = None, None
+    while True:                             # a parent may be tighter
+        limit = read_int(join(path, 'memory.max'))
+        if limit is not None and (tightest is None or limit < tightest):
+            result, tightest = path, limit
+        if len(path) <= len(cgroupdir):
+            break
+        path = dirname(path)
+    return result
+
+
+def apply_memcgroup(meminfo, path, limit):
+    ''' Recount memory info against the limits of a cgroup, as a process
+        inside it sees them.
+    '''
+    used = read_int(join(path, 'memory.current'))
+    if used is None:
+        return
+    cached = min(read_keyed(join(path, 'memory.stat'), ('file',))
+                 .get('file', 0), used)
+    meminfo.memtotal = limit
+    meminfo.memfree = max(limit - used, 0)
+    meminfo.buffers = 0
+    meminfo.cached = cached
+    meminfo.used = used - cached
+
+    swapused = read_int(join(path, 'memory.swap.current'))
+    if swapused is not None:
+        swapmax = read_int(join(path, 'memory.swap.max'))
+        if swapmax is not None:
+            meminfo.swaptotal = min(swapmax, meminfo.swaptotal)
+        meminfo.swapused = min(swapused, meminfo.swaptotal)
+        meminfo.swapcached = 0
+        meminfo.swapfree = meminfo.swaptotal - meminfo.swapused
+
+
+def get_cgroups(opts, top):
+    ''' Returns the top cgroups by memory used, with their ancestors, in
+        tree order, the biggest first among siblings.
+
+        Groups are found with scandir, listing only directories whose link
+        count says they have subgroups, and only until all are found.  Just
+        memory.current is read from each, memory.max from those returned.
+    '''
+    import heapq
+
+    def get_subdirs(stat):  # kernfs counts them in the link count
+        return stat.st_nlink - 2 if stat.st_nlink >= 2 else -1  # or unknown
+
+    groups = []
+    try:
+        stack = [(cgroupdir, get_subdirs(os.stat(cgroupdir)))]
+    except OSError:
+        stack = []
+    while stack:
+        path, subdirs = stack.pop()
+        if not subdirs:                     # a leaf, nothing to list
+            continue
+        try:
+            entries = os.scandir(path)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    path = entry.path
+                    used = read_int(path + '/memory.current')
+                    if used is not None:
+                        groups.append((used, path))
+                    stack.append((path, get_subdirs(
+                        entry.stat(follow_symlinks=False))))
+                    subdirs -= 1
+                    if not subdirs:         # the rest are files
+                        break
+    if opts.debug:
+        print('\n\ncgroups found:', len(groups))
+
+    usage = dict((path, used) for used, path in groups)
+    tree = {}                               # parent: shown children
+    shown = set()
+    for used, path in heapq.nlargest(top, groups):
+        while path in usage and path not in shown:
+            shown.add(path)
+            tree.setdefault(dirname(path), []).append(path)
+            path = dirname(path)
+
+    results = []
+    rootlen = len(cgroupdir) + 1
+    stack = sorted(tree.get(cgroupdir, ()), key=usage.get)
+    while stack:                            # depth first
+        path = stack.pop()
+        relpath = path[rootlen:]
+        results.append(CGroupInfo(path=relpath, depth=relpath.count('/') + 1,
+                                  used=usage[path],
+                                  limit=read_int(path + '/memory.max')))
+        stack.extend(sorted(tree.get(path, ()), key=usage.get))
+    return results
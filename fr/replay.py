@@ -0,0 +1,230 @@
+'''
+    replay.py - Recording and replay of inputs for fr.
+    License: GPLv3+.
+
+    Recorded inputs located here.  A recording is a tar archive of what a
+    run read from /proc, /sys and /dev, with the paths relative to the root:
+
+        files       contents, as read
+        folders     listed, and their subfolders
+        links       as read, or listed, made relative
+        statvfs.json    mount point: result, error number, or null if hung
+
+    Links along a path are followed while recording, as in the kernel, so
+    /sys/class/block/sda/size is stored below the /sys/devices it links to,
+    and /proc/self is stored as /proc/1, where it is read below a root.
+    Replaying unpacks the archive into a temporary folder and uses that as
+    the root, so the same code runs over the same inputs on any Linux box.
+    Nothing is unpacked outside it: members and links leading out, through
+    links unpacked earlier or not, are skipped.
+'''
+import builtins
+import io
+import json
+import os
+import tarfile
+from os.path import dirname, join, normpath
+
+
+# defaults
+stats_name  = 'statvfs.json'
+_max_links  = 40            # followed in one path, as the kernel does
+
+
+class Recorder:
+    ''' Stands in for the os module, and open(), of a platform module,
+        noting every file, listing, link and statvfs result passing through.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.root = ''
+        self.files = {}         # path: bytes
+        self.folders = set()
+        self.links = {}         # path: target
+        self.stats = {}         # mount point: statvfs fields, errno, None
+
+    def __getattr__(self, name):    # the rest of os
+        return getattr(os, name)
+
+    def install(self, pform):
+        self.pform = pform
+        self.root = pform.rootdir
+        pform.os = self
+        pform.open = self.open_file
+
+    def uninstall(self):
+        self.pform.os = os
+        del self.pform.open
+
+    def _note(self, path):
+        try:
+            with builtins.open(path, 'rb') as infile:
+                self.files[path] = infile.read()
+        except OSError:
+            pass
+
+    def open_file(self, path, *args, **kwargs):     # the builtin open
+        result = builtins.open(path, *args, **kwargs)
+        self._note(path)
+        return result
+
+    def open(self, path, flags, *args):
+        fd = os.open(path, flags, *args)
+        self._note(path)
+        return fd
+
+    def _note_folder(self, path):
+        self.folders.add(path)
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_symlink():
+                    self.links[entry.path] = os.readlink(entry.path)
+                elif entry.is_dir():
+                    self.folders.add(entry.path)
+
+    def scandir(self, path):
+        entries = os.scandir(path)
+        self._note_folder(path)
+        return entries
+
+    def listdir(self, path):
+        names = os.listdir(path)
+        self._note_folder(path)
+        return names
+
+    def readlink(self, path):
+        target = os.readlink(path)
+        self.links[path] = target
+        return target
+
+    def stat(self, path, *args, **kwargs):
+        result = os.stat(path, *args, **kwargs)
+        if os.path.isdir(path):
+            self.folders.add(path)
+        return result
+
+    def statvfs(self, path):
+        mntp = path[len(self.root):] or '/'
+        self.stats[mntp] = None             # until it answers
+        try:
+            result = os.statvfs(path)
+        except OSError as err:
+            self.stats[mntp] = err.errno
+            raise
+        self.stats[mntp] = list(result)
+        return result
+
+    def locate(self, path):
+        ''' Returns the name of path in the archive, with the links noted
+            along it followed, or None if outside the root.
+        '''
+        links = self.links
+        for _ in range(_max_links):
+            parts = path.split('/')
+            for end in range(2, len(parts)):    # only the folders
+                prefix = '/'.join(parts[:end])
+                if prefix in links:
+                    path = normpath(join(dirname(prefix), links[prefix],
+                                         *parts[end:]))
+                    break
+            else:
+                break
+        root = self.root + '/'
+        if not path.startswith(root):
+            return None
+        name = path[len(root):]
+        if name.startswith('proc/self/'):   # as read below a root
+            name = 'proc/1/' + name[10:]
+        return name
+
+    def save(self):
+        ''' Write the archive, folders first, then links and files. '''
+        def add(name, kind, data=b'', linkname=''):
+            info = tarfile.TarInfo(name)
+            info.type, info.size, info.linkname = kind, len(data), linkname
+            info.mode = 0o755 if kind == tarfile.DIRTYPE else 0o644
+            archive.addfile(info, io.BytesIO(data) if data else None)
+
+        with tarfile.open(self.path, 'w:gz') as archive:
+            add(stats_name, tarfile.REGTYPE,
+                json.dumps(self.stats, indent=0).encode('utf8'))
+            for path in sorted(self.folders):
+                name = self.locate(path)
+                if name:
+                    add(name, tarfile.DIRTYPE)
+            for path, target in sorted(self.links.items()):
+                name = self.locate(dirname(path))
+                if name:
+                    if os.path.isabs(target):   # as seen from the root
+                        target = os.path.relpath(target, '/' + name)
+                    add(join(name, os.path.basename(path)), tarfile.SYMTYPE,
+                        linkname=target)
+            for path, data in sorted(self.files.items()):
+                name = self.locate(path)
+                if name:
+                    add(name, tarfile.REGTYPE, data)
+
+
+class Replayer:
+    ''' Stands in for the os module of a platform module, with a recording
+        unpacked as its root, answering statvfs from the recorded results.
+    '''
+    def __init__(self, path):
+        from tempfile import TemporaryDirectory
+
+        self.tempdir = TemporaryDirectory(prefix='fr-replay-')
+        self.root = root = os.path.realpath(self.tempdir.name)
+        self.stats = {}
+        with tarfile.open(path) as archive:
+            for member in archive:
+                name = normpath(member.name)
+                if name == stats_name:
+                    self.stats = json.load(archive.extractfile(member))
+                    continue
+                target = join(root, name)
+                # stay inside, even through links unpacked earlier
+                if not self._inside(os.path.realpath(dirname(target))):
+                    continue
+                if member.issym():
+                    link = member.linkname
+                    if (os.path.isabs(link) or not self._inside(
+                            normpath(join(dirname(target), link)))):
+                        continue
+                    if not self._inside(target):
+                        continue
+                    os.makedirs(dirname(target), exist_ok=True)
+                    if not os.path.lexists(target):
+                        os.symlink(link, target)
+                elif not self._inside(os.path.realpath(target)):
+                    continue
+                elif member.isdir():
+                    os.makedirs(target, exist_ok=True)
+                elif member.isfile():
+                    os.makedirs(dirname(target), exist_ok=True)
+                    fd = os.open(target, os.O_WRONLY | os.O_CREAT |
+                                 os.O_TRUNC | os.O_NOFOLLOW, 0o644)
+                    with builtins.open(fd, 'wb') as outfile:
+                        outfile.write(archive.extractfile(member).read())
+
+    def _inside(self, path):
+        ''' Whether a path is below the root, once normalized. '''
+        return path.startswith(self.root + '/')
+
+    def __getattr__(self, name):    # the rest of os
+        return getattr(os, name)
+
+    def install(self, pform):
+        pform.set_root(self.root)
+        pform.os = self
+
+    def statvfs(self, path):
+        mntp = path[len(self.root):] or '/'
+        if mntp not in self.stats:
+            raise FileNotFoundError(2, os.strerror(2), path)
+        result = self.stats[mntp]
+        if result is None:                  # hung, until timed out
+            from threading import Event
+            Event().wait()
+        elif isinstance(result, int):
+            raise OSError(result, os.strerror(result), path)
+        return os.statvfs_result(result)
@@ -2,7 +2,8 @@
     fr - (C) 2012-18, Mike Miller
     License: GPLv3+.
 '''
-import subprocess
+import os
+from collections import namedtuple
 
 
 class Info(dict):
@@ -17,58 +18,180 @@ class Info(dict):
         return self.dev < other.dev
 
 
-class DiskInfo(Info):
+def _refuse(self, *args):
+    raise AttributeError(f'{self.__class__.__name__} is frozen')
+
+
+class Record:
+    ''' Compact, slotted base for fixed sets of attributes.  Each subclass
+        gets a frozen twin, refusing changes, that freeze() switches to.
+    '''
+    __slots__ = ()
+
+    def __init_subclass__(cls, frozen=False, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not frozen:
+            cls._fields = cls.__slots__
+            cls._frozen = type(cls.__name__, (cls,),
+                               dict(__slots__=(), __setattr__=_refuse,
+                                    __delattr__=_refuse), frozen=True)
+
+    def __lt__(self, other):  # sorting
+        return self.dev < other.dev
+
+    def freeze(self):
+        ''' Returns the record, no longer to be changed, e.g. once shared. '''
+        self.__class__ = self._frozen
+        return self
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self._asdict()})'
+
+    def _asdict(self):
+        return {name: getattr(self, name) for name in self._fields}
+
+
+class DiskInfo(Record):
     ''' Grouping of information related to a filesystem. '''
-    def __init__(self, **kwargs):
-
-        self.dev     = None      # short device name
-        self.fmt     = None      # fs formate
-        self.isimg   = None      # is a disk image
-        self.ismntd  = None      # is mounted
-        self.isnet   = None      # network drive
-        self.isopt   = None      # optical drive
-        self.isram   = None      # ram disk
-        self.isrem   = None      # removable
-        self.label   = None      # fs, not partition label
-        self.mntp    = None      # mount point
-        self.rw      = None      # writable
-
-        self.cap     = None      # capacity, converted to out unit
-        self.free    = None      # free space
-        self.ocap    = None      # orig capacity #
-        self.oused   = None      # orig used #
-        self.pcnt    = None      # percentage used
-        self.used    = None      # used, converted to out unit
-
-        # set attributes, if need be
-        for kwarg in kwargs:
-            setattr(self, kwarg, kwargs[kwarg])
-
-
-class MemInfo(Info):
-    ''' System memory information. '''
-    def __init__(self, **kwargs):
-
-        self.buffers    = None
-        self.cached     = None
-        self.memfree    = None
-        self.memtotal   = None
-        self.swapcached = None
-        self.swapfree   = None
-        self.swaptotal  = None
-        self.swapused   = None
-        self.used       = None
-
-        # set attributes, if need be
-        for kwarg in kwargs:
-            setattr(self, kwarg, kwargs[kwarg])
+    __slots__ = ('dev', 'fmt', 'ishung', 'isimg', 'ismntd', 'isnet', 'isopt',
+                 'isram', 'isrem', 'label', 'mntp', 'rw',
+                 'cap', 'free', 'pcnt', 'used')
+
+    def __init__(self, dev=None, fmt=None, ishung=None, isimg=None,
+                 ismntd=None, isnet=None, isopt=None, isram=None, isrem=None,
+                 label=None, mntp=None, rw=None,
+                 cap=None, free=None, pcnt=None, used=None):
+
+        self.dev     = dev       # short device name
+        self.fmt     = fmt       # fs formate
+        self.ishung  = ishung    # didn't respond, e.g. stale network mount
+        self.isimg   = isimg     # is a disk image
+        self.ismntd  = ismntd    # is mounted
+        self.isnet   = isnet     # network drive
+        self.isopt   = isopt     # optical drive
+        self.isram   = isram     # ram disk
+        self.isrem   = isrem     # removable
+        self.label   = label     # fs, not partition label
+        self.mntp    = mntp      # mount point
+        self.rw      = rw        # writable
+
+        self.cap     = cap       # capacity, in bytes
+        self.free    = free      # free space, in bytes
+        self.pcnt    = pcnt      # percentage used
+        self.used    = used      # used, in bytes
+
+
+class BlockDev(Record):
+    ''' A block device as found under /sys/class/block. '''
+    __slots__ = ('dev', 'parent', 'isopt', 'isrem', 'isrot', 'size', 'kind',
+                 'name', 'slaves', 'label', 'uuid', 'partlabel')
+
+    def __init__(self, dev=None, parent=None, isopt=None, isrem=None,
+                 isrot=None, size=None, kind=None, name=None, slaves=(),
+                 label=None, uuid=None, partlabel=None):
+
+        self.dev       = dev        # kernel name, e.g. sda1, dm-0
+        self.parent    = parent     # whole disk of a partition, or None
+        self.isopt     = isopt      # optical drive
+        self.isrem     = isrem      # removable
+        self.isrot     = isrot      # rotational, i.e. spinning disk
+        self.size      = size       # in bytes
+        self.kind      = kind       # 'dm' or 'md' for mapped, raid devices
+        self.name      = name       # device mapper name, e.g. vg-root
+        self.slaves    = slaves     # members of a dm or md device
+        self.label     = label      # fs label, from /dev/disk/by-*
+        self.uuid      = uuid
+        self.partlabel = partlabel
+
+
+class IOStat(Record):
+    ''' Block device activity, per second over the last interval. '''
+    __slots__ = ('dev', 'rbytes', 'wbytes', 'iops', 'latency', 'inflight')
+
+    def __init__(self, dev=None, rbytes=None, wbytes=None, iops=None,
+                 latency=None, inflight=None):
+
+        self.dev      = dev         # kernel name
+        self.rbytes   = rbytes      # bytes read per sec
+        self.wbytes   = wbytes      # bytes written per sec
+        self.iops     = iops        # requests completed per sec
+        self.latency  = latency     # average ms per request
+        self.inflight = inflight    # requests in progress now
+
+
+class MemInfo(Record):
+    ''' System memory information, in bytes. '''
+    __slots__ = ('buffers', 'cached', 'memfree', 'memtotal', 'swapcached',
+                 'swapfree', 'swaptotal', 'swapused', 'used')
+
+    def __init__(self, buffers=None, cached=None, memfree=None, memtotal=None,
+                 swapcached=None, swapfree=None, swaptotal=None,
+                 swapused=None, used=None):
+
+        self.buffers    = buffers
+        self.cached     = cached
+        self.memfree    = memfree
+        self.memtotal   = memtotal
+        self.swapcached = swapcached
+        self.swapfree   = swapfree
+        self.swaptotal  = swaptotal
+        self.swapused   = swapused
+        self.used       = used
+
+
+class CGroupInfo(Record):
+    ''' Memory use of a cgroup v2 control group, in bytes. '''
+    __slots__ = ('path', 'depth', 'used', 'limit')
+
+    def __init__(self, path=None, depth=None, used=None, limit=None):
+
+        self.path   = path      # relative to the hierarchy root
+        self.depth  = depth     # 1 for top level groups
+        self.used   = used      # memory.current
+        self.limit  = limit     # memory.max, None if unlimited
+
+
+class Snapshot(namedtuple('Snapshot', 'timestamp meminfo diskinfo')):
+    ''' Memory and disk info collected at one time, in exact bytes.
+
+        timestamp - seconds since the epoch, as from time.time()
+        meminfo   - a MemInfo record
+        diskinfo  - a tuple of DiskInfo records, sorted by device
+
+        The records are frozen, as snapshots are handed to several
+        renderers, and cached by frd and fr agent.
+    '''
+    __slots__ = ()
 
 
 def run(cmd, shell=False, debug=False):
     'Run a command and return the output.'
+    import subprocess
     proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, shell=shell)
     (out, _) = proc.communicate()  # no need for stderr
     if debug:
         print(cmd)
         print(out)
     return out
+
+
+def remove_stale(path):
+    ''' Remove a socket left at path by a previous run.  Raises
+        FileExistsError if something else is there, or still answers.
+    '''
+    import socket
+    import stat
+
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f'not a socket: {path}')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:     # nobody home
+            os.unlink(path)
+        else:
+            raise FileExistsError(f'already serving at {path}')
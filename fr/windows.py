@@ -4,7 +4,7 @@
 
     Data gathering routines located here.
 '''
-import sys, os, locale
+import sys, os
 import platform
 import stat
 
@@ -18,7 +18,6 @@ except ImportError:
     sys.exit('Error: winstats module not found.  C:\> pip3 install winstats')
 
 # icons and graphics chars?
-locale.setlocale(locale.LC_NUMERIC, '')
 #~ locale.setlocale(locale.LC_ALL, ('english_united-states', '437'))
 #~ os_encoding = locale.getpreferredencoding()
 #~ print('\n***********  encoding:', os_encoding)  # cp1252
@@ -39,6 +38,7 @@ win7ver  = '6.1.7600'
 vistver  = '6.0.6000'
 hicolor  = False
 boldbar  = True
+locale_cat = 'LC_NUMERIC'
 col_lblw = 'CACHE'
 col_lbls = 'CACHE'
 
@@ -99,15 +99,18 @@ class ColorNotAvail(Exception):
         return f'{self.__class__.__name__}: {self.__doc__}'
 
 
-def get_diskinfo(opts, show_all=False, local_only=False):
-    ''' Returns a list holding the current disk info,
-        stats divided by the ouptut unit.
+def get_diskinfo(opts, show_all=False, local_only=False, show_binds=False):
+    ''' Returns a list holding the current disk info, stats in bytes.
+        show_binds is accepted for compatibility, drives are never shared.
     '''
     disks = []
-    outunit = opts.outunit
+    mount_filter = getattr(opts, 'mount_filter', None)
+    keep = mount_filter and mount_filter.check
 
     for drive in get_drives():
         drive += ':\\'
+        if keep and not keep('', drive, ''):
+            continue
         disk = DiskInfo(dev=drive)
         try:
             usage = get_fs_usage(drive)
@@ -116,10 +119,9 @@ def get_diskinfo(opts, show_all=False, local_only=False):
                 usage = _diskusage(0, 0, 0)
             else:
                 continue
-        disk.ocap   = usage.total
-        disk.cap    = usage.total / outunit
-        disk.used   = usage.used / outunit
-        disk.free   = usage.free / outunit
+        disk.cap    = usage.total
+        disk.used   = usage.used
+        disk.free   = usage.free
         disk.label  = get_vol_info(drive).name
         if usage.total:
             disk.pcnt = float(usage.used) / usage.total * 100
@@ -130,7 +132,9 @@ def get_diskinfo(opts, show_all=False, local_only=False):
 
         # type is not working on Win7 under VirtualBox?
         dtint, dtstr = get_drive_type(drive)
-        setattr(disk, *_drive_type_result[dtint])
+        dtattr, dtval = _drive_type_result[dtint]
+        if dtval is not None:   # unknown, error
+            setattr(disk, dtattr, dtval)
 
         disk.rw = os.access(drive, os.W_OK)  # doesn't work on optical
         if usage.total:    # this not giving correct result on Win7 RTM either
@@ -146,11 +150,8 @@ def get_diskinfo(opts, show_all=False, local_only=False):
 
 
 def get_meminfo(opts):
-    ''' Returns a dictionary holding the current memory info,
-        divided by the ouptut unit.
-    '''
+    ''' Returns a record holding the current memory info, in bytes. '''
     meminfo = MemInfo()
-    outunit = opts.outunit
     mstat = get_mem_info()  # from winstats
     pinf = get_perf_info()
     try:
@@ -160,9 +161,9 @@ def get_meminfo(opts):
         pgpcnt = 0
 
     totl = mstat.TotalPhys
-    meminfo.memtotal = totl / float(outunit)
+    meminfo.memtotal = totl
     used = totl * mstat.MemoryLoad / 100.0  # percent, more reliable
-    meminfo.used = used / float(outunit)
+    meminfo.used = int(used)
     left = totl - used
 
     # Cached
@@ -171,12 +172,12 @@ def get_meminfo(opts):
         # Win7 RTM bug :/ this cache number is bogus
         free = get_perf_data(r'\Memory\Free & Zero Page List Bytes', 'long')[0]
         cache = left - free
-        meminfo.memfree = free / float(outunit)
+        meminfo.memfree = free
     else:
-        meminfo.memfree = (totl - used - cache) / float(outunit)
+        meminfo.memfree = int(totl - used - cache)
     meminfo.buffers = 0
 
-    meminfo.cached = cache / float(outunit)
+    meminfo.cached = int(cache)
 
     # SWAP  these numbers are actually commit charge, not swap; fix
     #       should not contain RAM :/
@@ -185,9 +186,9 @@ def get_meminfo(opts):
     swpu = swpt * pgpcnt
     swpf = swpt - swpu
 
-    meminfo.swaptotal = swpt / float(outunit)
-    meminfo.swapfree = swpf / float(outunit)
-    meminfo.swapused = swpu / float(outunit)
+    meminfo.swaptotal = swpt
+    meminfo.swapfree = int(swpf)
+    meminfo.swapused = int(swpu)
     meminfo.swapcached = 0  # A linux stat for compat
 
     if opts.debug:
@@ -19,6 +19,8 @@ scripts = [join(pkgname, pkgname)]
 if os.name == 'nt':
     scripts.append('fr.cmd')
     extras_require['win'] = ['winstats', 'colorama']
+else:
+    scripts.append(join(pkgname, 'frd'))    # resident daemon
 
 
 setup(